@@ -8,10 +8,35 @@ source /etc/profile.d/vendor-libs.sh
 # path to the log for this shell script - used by log() in common.sh
 readonly startup_log="/tmp/worker_startup.log"
 
+# CELERY_WORKER_PROFILE picks the queues a worker consumes, its concurrency
+# and prefetch multiplier; all (the default) runs every queue in one worker
+# with beat, the others are for one worker container per workload.
+set_profile () {
+    profile="${CELERY_WORKER_PROFILE:-all}"
+    options="-B"
+    case "${profile}" in
+        imports)
+            queues="imports"; concurrency=2; prefetch=1; options="" ;;
+        csw)
+            queues="csw"; concurrency=2; prefetch=1; options="" ;;
+        thumbnails)
+            queues="thumbnails"; concurrency=4; prefetch=1; options="" ;;
+        default)
+            # same variable as the CELERY_DEFAULT_QUEUE setting
+            queues="${CELERY_DEFAULT_QUEUE:-celery}"; concurrency=4; prefetch=4 ;;
+        *)
+            profile="all"; queues=""; concurrency=""; prefetch=1 ;;
+    esac
+    export CELERYD_PREFETCH_MULTIPLIER="${CELERYD_PREFETCH_MULTIPLIER:-${prefetch}}"
+    concurrency="${CELERYD_CONCURRENCY:-${concurrency}}"
+}
+
 start_worker () {
     # TODO: disable pickle to reduce screaming in startup log w/o C_FORCE_ROOT
     cd /mnt/exchange
-    C_FORCE_ROOT=1 /env/bin/celery worker --app=exchange.celery_app:app -B --loglevel INFO &
+    C_FORCE_ROOT=1 /env/bin/celery worker --app=exchange.celery_app:app ${options} \
+        ${queues:+--queues=${queues}} ${concurrency:+--concurrency=${concurrency}} \
+        --hostname="${profile}@%h" --loglevel INFO &
     pid=$!
 }
 
@@ -23,5 +48,6 @@ load_settings
 install_dependencies
 wait_for_pg "database"
 wait_for_url "exchange" "http://exchange"
+set_profile
 start_worker
 started "celery" "${pid}"
@@ -19,6 +19,8 @@
 #########################################################################
 
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_ipv46_address
 from . import models
 
 
@@ -49,17 +51,37 @@ class AuditEventAdmin(admin.ModelAdmin):
         'resource_title'
     ]
 
-    search_fields = [
+    list_filter = [
+        'datetime',
         'event',
-        'username',
-        'ip',
-        'email',
-        'fullname',
-        'resource_type',
-        'resource_uuid',
-        'resource_title'
+        'resource_type'
     ]
 
+    # exact matches only, icontains over millions of rows can't use indexes
+    # ip is an inet column, it's only searched for terms that are addresses
+    search_fields = [
+        '=username',
+        '=email',
+        '=resource_uuid'
+    ]
+
+    # skip the count(*) over the whole table on every changelist page
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        results, use_distinct = super(
+            AuditEventAdmin, self
+        ).get_search_results(request, queryset, search_term)
+        search_term = search_term.strip()
+        if search_term:
+            try:
+                validate_ipv46_address(search_term)
+            except ValidationError:
+                pass
+            else:
+                results |= queryset.filter(ip=search_term)
+        return results, use_distinct
+
     def __init__(self, *args, **kwargs):
         super(AuditEventAdmin, self).__init__(*args, **kwargs)
         self.list_display_links = (None, )
@@ -27,3 +27,6 @@ class ExchangeAuditConfig(AppConfig):
 
     def ready(self):
         import exchange.audit.signals  # noqa
+        from .registry import registry
+        from .settings import AUDIT_MODELS
+        registry.register_labels(AUDIT_MODELS)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2017 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+import fcntl
+import glob
+import gzip
+import json
+import logging
+import os
+import shutil
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RotatingAuditLog(object):
+    """
+    append-only json lines audit log, rotated by size and by time interval.
+    every append takes an exclusive flock on the log file, so entries from
+    many gunicorn and celery worker processes never interleave and only one
+    of them rotates a segment. rotated segments are gzipped and the oldest
+    ones pruned past backup_count.
+    """
+
+    def __init__(self, path, max_bytes=0, interval=0, compress=True,
+                 backup_count=0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.compress = compress
+        self.backup_count = backup_count
+
+    def write(self, d):
+        line = json.dumps(d, sort_keys=True) + '\n'
+        rotated = None
+        while True:
+            f = open(self.path, 'a')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                if not self._is_current(f):
+                    # another process rotated the file while we waited on
+                    # the lock, append to the new segment instead
+                    continue
+                if rotated is None and self._should_rotate(f, len(line)):
+                    rotated = self._rotate()
+                    continue
+                f.write(line)
+                f.flush()
+                break
+            finally:
+                f.close()
+        if rotated:
+            self._compress(rotated)
+            self._prune()
+
+    def _is_current(self, f):
+        try:
+            return os.stat(self.path).st_ino == os.fstat(f.fileno()).st_ino
+        except OSError:
+            return False
+
+    def _should_rotate(self, f, length):
+        st = os.fstat(f.fileno())
+        if st.st_size == 0:
+            return False
+        if self.max_bytes and st.st_size + length > self.max_bytes:
+            return True
+        if self.interval:
+            now = int(time.time())
+            return int(st.st_mtime) // self.interval != now // self.interval
+        return False
+
+    def _rotate(self):
+        """rename the current segment, must be called holding the lock"""
+        # names sort oldest first, which is what _prune relies on
+        now = time.time()
+        prefix = '%s.%s%06d' % (self.path,
+                                time.strftime('%Y%m%d%H%M%S',
+                                              time.localtime(now)),
+                                int(now % 1 * 1000000))
+        sequence = 0
+        rotated = '%s.%04d' % (prefix, sequence)
+        while os.path.exists(rotated) or os.path.exists(rotated + '.gz'):
+            sequence += 1
+            rotated = '%s.%04d' % (prefix, sequence)
+        os.rename(self.path, rotated)
+        return rotated
+
+    def _compress(self, rotated):
+        if not self.compress:
+            return
+        try:
+            with open(rotated, 'rb') as src:
+                with gzip.open(rotated + '.gz', 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        except (IOError, OSError):
+            logger.exception('could not compress audit log %s', rotated)
+
+    def _prune(self):
+        if not self.backup_count:
+            return
+        # segments still being compressed by another process are left alone
+        pattern = '%s.*.gz' if self.compress else '%s.*'
+        segments = sorted(glob.glob(pattern % self.path))
+        for segment in segments[:-self.backup_count]:
+            try:
+                os.remove(segment)
+            except OSError:
+                pass
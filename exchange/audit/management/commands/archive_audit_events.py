@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import gzip
+import json
+import os
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from exchange.audit.models import AuditEvent
+from exchange.audit.query import event_to_dict, iter_events
+from exchange.audit.settings import (AUDIT_ARCHIVE_LOCATION,
+                                     AUDIT_RETENTION_DAYS)
+from optparse import make_option
+
+
+class Command(BaseCommand):
+    help = ('Move audit events older than the retention period to a gzipped '
+            'JSON lines archive file.')
+    option_list = BaseCommand.option_list + (
+        make_option('--days',
+            action='store',
+            dest='days',
+            type='int',
+            default=AUDIT_RETENTION_DAYS),
+        make_option('--batch_size',
+            action='store',
+            dest='batch_size',
+            type='int',
+            default=5000),
+        make_option('--dry_run',
+            action='store_true',
+            dest='dry_run',
+            default=False),
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        old_events = AuditEvent.objects.filter(datetime__lt=cutoff)
+        if options['dry_run']:
+            self.stdout.write('%d audit events older than %s' % (
+                old_events.count(), cutoff.isoformat()))
+            return
+
+        if not os.path.isdir(AUDIT_ARCHIVE_LOCATION):
+            os.makedirs(AUDIT_ARCHIVE_LOCATION)
+        archive = os.path.join(
+            AUDIT_ARCHIVE_LOCATION,
+            'exchange_audit_%s.json.gz' % timezone.now().strftime(
+                '%Y%m%d%H%M%S')
+        )
+
+        # events are read one batch at a time in id order, so neither
+        # the archive nor the delete holds the whole range in memory.
+        batch_size = options['batch_size']
+        archived = 0
+        last_id = 0
+        with gzip.open(archive, 'wb') as out:
+            for event in iter_events(old_events, batch_size=batch_size):
+                out.write(json.dumps(event_to_dict(event), sort_keys=True))
+                out.write('\n')
+                last_id = event.id
+                archived += 1
+
+        # only delete once the archive has been written and closed
+        archived_events = old_events.filter(id__lte=last_id)
+        while True:
+            ids = list(archived_events.values_list('id', flat=True)
+                       [:batch_size])
+            if not ids:
+                break
+            AuditEvent.objects.filter(id__in=ids).delete()
+
+        self.stdout.write('Archived %d audit events to %s' % (
+            archived, archive))
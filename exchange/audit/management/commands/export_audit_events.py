@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from exchange.audit.models import AuditEvent
+from exchange.audit.query import (EXPORT_FORMATS, filter_events, iter_csv,
+                                  iter_events)
+from exchange.audit.settings import AUDIT_EXPORT_BATCH_SIZE
+from optparse import make_option
+
+
+class Command(BaseCommand):
+    help = ('Export audit events as ndjson or csv over a datetime range. '
+            'Pass the last exported id as --after_id to resume an export.')
+    option_list = BaseCommand.option_list + (
+        make_option('--format',
+            action='store',
+            dest='format',
+            default='ndjson'),
+        make_option('--start',
+            action='store',
+            dest='start',
+            help='ISO 8601 datetime, inclusive'),
+        make_option('--end',
+            action='store',
+            dest='end',
+            help='ISO 8601 datetime, exclusive'),
+        make_option('--after_id',
+            action='store',
+            dest='after_id',
+            type='int',
+            default=0),
+        make_option('--batch_size',
+            action='store',
+            dest='batch_size',
+            type='int',
+            default=AUDIT_EXPORT_BATCH_SIZE),
+        make_option('--output',
+            action='store',
+            dest='output',
+            help='file to append to, defaults to stdout'),
+        )
+
+    def handle(self, *args, **options):
+        if options['format'] not in EXPORT_FORMATS:
+            raise CommandError('Unsupported format "%s"' % options['format'])
+        try:
+            queryset = filter_events(AuditEvent.objects.all(), options)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        serializer = EXPORT_FORMATS[options['format']][0]
+        output = options['output']
+        # a resumed export or one appended to a file has its header already
+        if options['format'] == 'csv' and (
+                options['after_id'] or
+                (output and os.path.exists(output) and
+                 os.path.getsize(output))):
+            serializer = lambda events: iter_csv(events, header=False)
+        last = {'id': options['after_id']}
+
+        def track(events):
+            for event in events:
+                yield event
+                last['id'] = event.id
+
+        events = track(iter_events(queryset,
+                                   after_id=options['after_id'],
+                                   batch_size=options['batch_size']))
+        out = open(output, 'ab') if output else sys.stdout
+        try:
+            for chunk in serializer(events):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+            # reported on stderr so it never ends up in the export itself
+            self.stderr.write('Last exported audit event id: %d' % last['id'])
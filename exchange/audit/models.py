@@ -33,7 +33,7 @@ class AuditEvent(models.Model):
     fullname = models.CharField(max_length=255, null=True, blank=True)
     superuser = models.NullBooleanField()
     staff = models.NullBooleanField()
-    datetime = models.DateTimeField(auto_now_add=True)
+    datetime = models.DateTimeField(auto_now_add=True, db_index=True)
     resource_type = models.CharField(max_length=16, null=True, blank=True)
     resource_uuid = models.CharField(max_length=64, null=True, blank=True)
     resource_title = models.CharField(max_length=255, null=True, blank=True)
@@ -42,3 +42,10 @@ class AuditEvent(models.Model):
         verbose_name = 'audit event'
         verbose_name_plural = 'audit events'
         ordering = ['-datetime']
+        # filtered lookups are always sorted newest first, these also
+        # serve lookups on their first column alone
+        index_together = [
+            ['event', 'datetime'],
+            ['username', 'datetime'],
+            ['resource_uuid', 'datetime'],
+        ]
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2017 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from exchange.core.streaming import csv_value, csv_writer
+from .models import AuditEvent
+from .settings import AUDIT_EXPORT_BATCH_SIZE, AUDIT_PAGE_SIZE
+
+# fields that can be filtered with an exact match, all of them indexed
+FILTER_FIELDS = ['event', 'username', 'resource_uuid']
+
+EXPORT_FIELDS = [
+    'id',
+    'event',
+    'username',
+    'ip',
+    'email',
+    'fullname',
+    'superuser',
+    'staff',
+    'datetime',
+    'resource_type',
+    'resource_uuid',
+    'resource_title'
+]
+
+
+def event_to_dict(event):
+    """serialize an audit event for the query and export apis"""
+    return {
+        'id': event.id,
+        'event': event.event,
+        'username': event.username,
+        'ip': event.ip,
+        'email': event.email,
+        'fullname': event.fullname,
+        'superuser': event.superuser,
+        'staff': event.staff,
+        'datetime': event.datetime.isoformat(),
+        'resource_type': event.resource_type,
+        'resource_uuid': event.resource_uuid,
+        'resource_title': event.resource_title,
+    }
+
+
+def encode_cursor(event):
+    """encode the position of an event as an opaque page cursor"""
+    position = '%s|%d' % (event.datetime.isoformat(), event.id)
+    return base64.urlsafe_b64encode(position.encode('utf-8'))
+
+
+def decode_cursor(cursor):
+    """decode a page cursor, raises ValueError if it is malformed"""
+    try:
+        position = base64.urlsafe_b64decode(str(cursor)).decode('utf-8')
+        dt, pk = position.rsplit('|', 1)
+        dt = parse_datetime(dt)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor "%s"' % cursor)
+    if dt is None:
+        raise ValueError('Invalid cursor "%s"' % cursor)
+    return dt, pk
+
+
+def filter_events(queryset, filters):
+    """apply the exact and datetime range filters to an event queryset"""
+    for field in FILTER_FIELDS:
+        if filters.get(field):
+            queryset = queryset.filter(**{field: filters[field]})
+    for param, lookup in (('start', 'datetime__gte'), ('end', 'datetime__lt')):
+        if filters.get(param):
+            value = parse_datetime(filters[param])
+            if value is None:
+                raise ValueError('Invalid datetime "%s"' % filters[param])
+            queryset = queryset.filter(**{lookup: value})
+    return queryset
+
+
+def get_events(filters=None, cursor=None, limit=AUDIT_PAGE_SIZE):
+    """
+    get a page of audit events, newest first, and the cursor of the next
+    page (None on the last one). pages are keyed on (datetime, id) rather
+    than offsets, so deep pages cost the same as the first one.
+    """
+    queryset = filter_events(AuditEvent.objects.all(), filters or {})
+    if cursor:
+        dt, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(datetime__lt=dt) | Q(datetime=dt, id__lt=pk)
+        )
+    events = list(queryset.order_by('-datetime', '-id')[:limit + 1])
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = encode_cursor(events[-1])
+    return events, next_cursor
+
+
+def iter_events(queryset, after_id=None, batch_size=AUDIT_EXPORT_BATCH_SIZE):
+    """
+    iterate a queryset of events in id order, one batch per query. each
+    batch starts after the last id seen, so memory stays constant
+    whatever the size of the range and an interrupted export can be
+    resumed by passing the last exported id as after_id.
+    """
+    last_id = after_id or 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)
+                     .order_by('id')[:batch_size])
+        if not batch:
+            return
+        for event in batch:
+            yield event
+        last_id = batch[-1].id
+
+
+def iter_ndjson(events):
+    """serialize events as newline delimited json"""
+    for event in events:
+        yield json.dumps(event_to_dict(event), sort_keys=True) + '\n'
+
+
+def iter_csv(events, header=True):
+    """
+    serialize events as csv rows, with a header row first unless the rows
+    are appended to an earlier export
+    """
+    writer = csv_writer()
+    if header:
+        yield writer.writerow(EXPORT_FIELDS)
+    for event in events:
+        d = event_to_dict(event)
+        yield writer.writerow([csv_value(d[field])
+                               for field in EXPORT_FIELDS])
+
+
+EXPORT_FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+    'csv': (iter_csv, 'text/csv'),
+}
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2017 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+import logging
+
+from django.apps import apps
+from django.db.models import signals as models_signals
+
+logger = logging.getLogger(__name__)
+
+
+class AuditRegistry(object):
+    """
+    registry of the models audited on save and delete. the audit signal
+    handlers are connected per registered sender, so saves of unrelated
+    models (sessions, permissions, task results...) never reach them.
+    """
+
+    def __init__(self):
+        self._registry = {}
+
+    def register(self, model, resource_type=None):
+        """register a model and connect the audit crud handlers to it"""
+        from .signals import post_save, post_delete
+
+        if model in self._registry:
+            return
+        self._registry[model] = resource_type or model._meta.model_name
+        models_signals.post_save.connect(
+            post_save,
+            sender=model,
+            dispatch_uid=self._dispatch_uid('post_save', model)
+        )
+        models_signals.post_delete.connect(
+            post_delete,
+            sender=model,
+            dispatch_uid=self._dispatch_uid('post_delete', model)
+        )
+
+    def unregister(self, model):
+        """stop auditing a model and disconnect its handlers"""
+        if self._registry.pop(model, None) is None:
+            return
+        models_signals.post_save.disconnect(
+            sender=model,
+            dispatch_uid=self._dispatch_uid('post_save', model)
+        )
+        models_signals.post_delete.disconnect(
+            sender=model,
+            dispatch_uid=self._dispatch_uid('post_delete', model)
+        )
+
+    def register_labels(self, labels):
+        """register models given as 'app_label.ModelName' strings"""
+        for label in labels:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError):
+                logger.warning('audit model %s is not installed.', label)
+                continue
+            self.register(model)
+
+    def is_registered(self, model):
+        return model in self._registry
+
+    def get_resource_type(self, instance):
+        """get the audit resource type of an instance, None if not audited"""
+        return self._registry.get(type(instance))
+
+    @staticmethod
+    def _dispatch_uid(signal_name, model):
+        return 'audit_signals_%s_%s_%s' % (
+            signal_name,
+            model._meta.app_label,
+            model._meta.model_name
+        )
+
+
+registry = AuditRegistry()
@@ -31,3 +31,56 @@ AUDIT_LOGFILE_LOCATION = getattr(
     'AUDIT_LOGFILE_LOCATION',
     'exchange_audit_log.json'
 )
+# rotate the audit log past this many bytes, 0 disables
+AUDIT_LOGFILE_MAX_BYTES = getattr(
+    settings,
+    'AUDIT_LOGFILE_MAX_BYTES',
+    100 * 1024 * 1024
+)
+# rotate the audit log every interval seconds, 0 disables
+AUDIT_LOGFILE_ROTATE_INTERVAL = getattr(
+    settings,
+    'AUDIT_LOGFILE_ROTATE_INTERVAL',
+    24 * 60 * 60
+)
+AUDIT_LOGFILE_COMPRESS = getattr(
+    settings,
+    'AUDIT_LOGFILE_COMPRESS',
+    True
+)
+# rotated audit logs to keep, 0 keeps all of them
+AUDIT_LOGFILE_BACKUP_COUNT = getattr(
+    settings,
+    'AUDIT_LOGFILE_BACKUP_COUNT',
+    5
+)
+AUDIT_MODELS = getattr(
+    settings,
+    'AUDIT_MODELS',
+    (
+        'base.ContactRole',
+        'documents.Document',
+        'layers.Layer',
+        'maps.Map',
+    )
+)
+AUDIT_PAGE_SIZE = getattr(
+    settings,
+    'AUDIT_PAGE_SIZE',
+    100
+)
+AUDIT_RETENTION_DAYS = getattr(
+    settings,
+    'AUDIT_RETENTION_DAYS',
+    365
+)
+AUDIT_ARCHIVE_LOCATION = getattr(
+    settings,
+    'AUDIT_ARCHIVE_LOCATION',
+    'audit_archive'
+)
+AUDIT_EXPORT_BATCH_SIZE = getattr(
+    settings,
+    'AUDIT_EXPORT_BATCH_SIZE',
+    2000
+)
@@ -21,7 +21,6 @@
 import logging
 
 from django.contrib.auth import signals as auth_signals, get_user_model
-from django.db.models import signals as models_signals
 from .models import AuditEvent
 from .settings import AUDIT_TO_FILE
 from .utils import (get_audit_crud_dict, get_audit_login_dict, get_time_gmt,
@@ -33,7 +32,7 @@ logger = logging.getLogger(__name__)
 def post_save(sender, instance, created, raw, using, update_fields, **kwargs):
     """
     signal to catch save signals (create and update) and log them in
-    the audit log.
+    the audit log. only connected to the senders in the audit registry.
     """
     try:
         if created:
@@ -181,14 +180,6 @@ def user_login_failed(sender, credentials, **kwargs):
         pass
 
 
-models_signals.post_save.connect(
-    post_save,
-    dispatch_uid='easy_audit_signals_post_save'
-)
-models_signals.post_delete.connect(
-    post_delete,
-    dispatch_uid='easy_audit_signals_post_delete'
-)
 auth_signals.user_logged_in.connect(
     user_logged_in,
     dispatch_uid='audit_signals_logged_out'
@@ -0,0 +1,8 @@
+from django.conf.urls import url
+
+from .views import audit_events, audit_export
+
+urlpatterns = (
+    url(r'^audit/events/$', audit_events, name='audit_events'),
+    url(r'^audit/export/$', audit_export, name='audit_export'),
+)
@@ -18,30 +18,36 @@
 #
 #########################################################################
 
-import json
-from .settings import AUDIT_LOGFILE_LOCATION
-from geonode.base.models import ContactRole
-from geonode.documents.models import Document
-from geonode.layers.models import Layer
-from geonode.maps.models import Map
+from .logfile import RotatingAuditLog
+from .registry import registry
+from .settings import (AUDIT_LOGFILE_BACKUP_COUNT, AUDIT_LOGFILE_COMPRESS,
+                       AUDIT_LOGFILE_LOCATION, AUDIT_LOGFILE_MAX_BYTES,
+                       AUDIT_LOGFILE_ROTATE_INTERVAL)
 from time import gmtime, strftime
 
+audit_log = RotatingAuditLog(
+    AUDIT_LOGFILE_LOCATION,
+    max_bytes=AUDIT_LOGFILE_MAX_BYTES,
+    interval=AUDIT_LOGFILE_ROTATE_INTERVAL,
+    compress=AUDIT_LOGFILE_COMPRESS,
+    backup_count=AUDIT_LOGFILE_BACKUP_COUNT
+)
+
 
 def get_audit_crud_dict(instance, event):
     """get audit crud details and return as dictionary"""
-    audit_models = [ContactRole, Document, Layer, Map]
-    for idx, item in enumerate(audit_models):
-        if isinstance(instance, item):
-            d = {}
-            # populate resource details from instance
-            d['resource'] = get_resource(instance)
-            # user details are only accessible via geonode contactroles
-            if d['resource']['type'] == 'contactrole':
-                d['user_details'] = get_user_crud_details(instance.contact)
-            # determine if created or updated
-            d['event'] = event
-            d['event_time_gmt'] = get_time_gmt()
-            return d
+    if registry.get_resource_type(instance) is None:
+        return None
+    d = {}
+    # populate resource details from instance
+    d['resource'] = get_resource(instance)
+    # user details are only accessible via geonode contactroles
+    if d['resource']['type'] == 'contactrole':
+        d['user_details'] = get_user_crud_details(instance.contact)
+    # determine if created or updated
+    d['event'] = event
+    d['event_time_gmt'] = get_time_gmt()
+    return d
 
 
 def get_audit_login_dict(request, user, event):
@@ -68,15 +74,8 @@ def get_time_gmt():
 
 def get_resource(instance):
     """get geonode object resource details and return as resource dictonary"""
-    # Determine resource type from the model
-    if isinstance(instance, Document):
-        resource_type = 'document'
-    elif isinstance(instance, Layer):
-        resource_type = 'layer'
-    elif isinstance(instance, Map):
-        resource_type = 'map'
-    else:
-        resource_type = "contactrole"
+    # Determine resource type from the audit registry
+    resource_type = registry.get_resource_type(instance)
     # set contactrole resource type to associated model
     if resource_type == 'contactrole':
         instance = instance.resource
@@ -103,10 +102,7 @@ def get_user_crud_details(contact):
 
 def write_entry(d):
     """write dictionary to json file output"""
-    with open(AUDIT_LOGFILE_LOCATION, 'a') as j:
-        json.dump(d, j, sort_keys=True)
-        j.write('\n')
-        j.close()
+    audit_log.write(d)
 
 
 def get_client_ip(request):
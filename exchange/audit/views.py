@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2017 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse, StreamingHttpResponse
+from .models import AuditEvent
+from .query import (EXPORT_FORMATS, event_to_dict, filter_events, get_events,
+                    iter_events)
+from .settings import AUDIT_PAGE_SIZE
+
+
+@staff_member_required
+def audit_events(request):
+    """
+    cursor paginated audit event list. accepts the event, username,
+    resource_uuid, start and end filters plus the cursor returned as
+    next by the previous page.
+    """
+    try:
+        limit = min(int(request.GET.get('limit', AUDIT_PAGE_SIZE)),
+                    AUDIT_PAGE_SIZE)
+        events, next_cursor = get_events(
+            filters=request.GET,
+            cursor=request.GET.get('cursor'),
+            limit=max(limit, 1)
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'events': [event_to_dict(event) for event in events],
+        'next': next_cursor
+    })
+
+
+@staff_member_required
+def audit_export(request):
+    """
+    stream audit events as ndjson or csv in id order. takes the same
+    filters as audit_events, plus after_id to resume a previous export
+    from the last id it received.
+    """
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse(
+            {'error': 'Unsupported format "%s"' % export_format},
+            status=400
+        )
+    try:
+        queryset = filter_events(AuditEvent.objects.all(), request.GET)
+        after_id = int(request.GET.get('after_id') or 0)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    serializer, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(
+        serializer(iter_events(queryset, after_id=after_id)),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        'attachment; filename="exchange_audit.%s"' % export_format
+    )
+    return response
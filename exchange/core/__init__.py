@@ -17,3 +17,5 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 #
 #########################################################################
+
+default_app_config = 'exchange.core.apps.ExchangeCoreConfig'
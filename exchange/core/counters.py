@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2016 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+# seconds between two writes of the view counts by the
+# flush_popular_counts task
+POPULAR_COUNT_FLUSH_INTERVAL = getattr(
+    settings,
+    'POPULAR_COUNT_FLUSH_INTERVAL',
+    60
+)
+
+# the counts are kept well past the flush that should write them, in case
+# a run is late or fails
+_TIMEOUT = max(POPULAR_COUNT_FLUSH_INTERVAL * 10, 3600)
+
+# views are counted in generations. the flush task closes the current one
+# and writes those closed before it, no request is adding to them anymore.
+_GENERATION_KEY = 'popular_count_generation'
+_FLUSHED_KEY = 'popular_count_flushed'
+# generations older than this when a flush runs are skipped, e.g. when the
+# generation key was evicted and restarted
+_MAX_BACKLOG = 10
+
+
+def _count_key(generation, resource_id):
+    return 'popular_count:%s:%s' % (generation, resource_id)
+
+
+def _slots_key(generation):
+    return 'popular_count_slots:%s' % generation
+
+
+def _slot_key(generation, slot):
+    return 'popular_count_slot:%s:%s' % (generation, slot)
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, _TIMEOUT):
+            return 1
+        return cache.incr(key)
+
+
+def _current_generation():
+    generation = cache.get(_GENERATION_KEY)
+    if generation is None:
+        # never restart from a generation that was already written
+        cache.add(_GENERATION_KEY, int(time.time()), None)
+        generation = cache.get(_GENERATION_KEY)
+    return generation
+
+
+def record_view(resource):
+    """
+    count a view of a resource towards its popular_count. the count is
+    kept in the shared cache and written by the flush_popular_counts task,
+    instead of an update of the same hot row on every page view.
+    """
+    generation = _current_generation()
+    key = _count_key(generation, resource.pk)
+    if cache.add(key, 1, _TIMEOUT):
+        # first view of the resource in this generation, list it for the
+        # flush. slots are numbered by an atomic incr so that concurrent
+        # first views of different resources don't overwrite each other
+        slot = _incr(_slots_key(generation))
+        cache.set(_slot_key(generation, slot), resource.pk, _TIMEOUT)
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        # evicted since the add, the view is lost
+        pass
+
+
+def _write_generation(generation):
+    from geonode.base.models import ResourceBase
+
+    slot_keys = [_slot_key(generation, slot) for slot in
+                 xrange(1, (cache.get(_slots_key(generation)) or 0) + 1)]
+    count_keys = dict(
+        (_count_key(generation, resource_id), resource_id)
+        for resource_id in cache.get_many(slot_keys).values()
+    )
+    by_count = defaultdict(list)
+    for key, count in cache.get_many(count_keys.keys()).items():
+        by_count[count].append(count_keys[key])
+    # one update per distinct count
+    for count, resource_ids in by_count.items():
+        ResourceBase.objects.filter(id__in=resource_ids).update(
+            popular_count=F('popular_count') + count
+        )
+    cache.delete_many(slot_keys + count_keys.keys() +
+                      [_slots_key(generation)])
+    return sum(count * len(ids) for count, ids in by_count.items())
+
+
+def flush_popular_counts():
+    """
+    close the current generation of view counts and write the counts of
+    the generations closed before it to ResourceBase.popular_count.
+    returns the number of views written.
+    """
+    current = _current_generation()
+    try:
+        cache.incr(_GENERATION_KEY)
+    except ValueError:
+        # evicted, restarted from the clock by the next view
+        pass
+    flushed = cache.get(_FLUSHED_KEY)
+    first = current - 1 if flushed is None else flushed + 1
+    first = max(first, current - _MAX_BACKLOG)
+    views = 0
+    for generation in xrange(first, current):
+        views += _write_generation(generation)
+        cache.set(_FLUSHED_KEY, generation, None)
+    return views
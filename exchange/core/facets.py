@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2016 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from geonode.base.models import ResourceBase
+from geonode.groups.models import GroupProfile
+from guardian.shortcuts import get_objects_for_user
+
+# seconds facet counts are cached for, changes to resources, users, groups
+# and permissions invalidate them sooner
+FACETS_CACHE_TIMEOUT = getattr(settings, 'FACETS_CACHE_TIMEOUT', 60)
+
+_VERSION_KEY = 'exchange_facets_version'
+
+
+def _get_version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(_VERSION_KEY, version, None)
+    return version
+
+
+def invalidate_facets(**kwargs):
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        # not in the cache, nothing cached under a version either
+        pass
+
+
+def _permission_scope(user):
+    if settings.SKIP_PERMS_FILTER or user.is_superuser:
+        return 'all'
+    if not user.is_authenticated():
+        return 'anonymous'
+    return 'user-%s' % user.pk
+
+
+def get_facets(user, title_filter='', facet_type='all'):
+    '''
+    facet counts for the resources the user can view, cached per
+    permission scope, title filter and facet type.
+    '''
+    key = 'exchange_facets:%s:%s:%s:%s' % (
+        _get_version(),
+        _permission_scope(user),
+        facet_type,
+        hashlib.md5(title_filter.encode('utf-8')).hexdigest()
+    )
+    facets = cache.get(key)
+    if facets is None:
+        facets = count_facets(user, title_filter, facet_type)
+        cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
+
+
+def count_facets(user, title_filter='', facet_type='all'):
+    '''
+    count the resources by type: the layers by store type in one query,
+    the maps, documents and stories together in another.
+    '''
+    from geonode.documents.models import Document
+    from geonode.layers.models import Layer
+    from geonode.maps.models import Map
+
+    authorized = None
+    if not settings.SKIP_PERMS_FILTER:
+        authorized = get_objects_for_user(
+            user, 'base.view_resourcebase').values('id')
+
+    if facet_type == 'documents':
+        documents = Document.objects.filter(title__icontains=title_filter)
+
+        if settings.RESOURCE_PUBLISHING:
+            documents = documents.filter(is_published=True)
+
+        if authorized is not None:
+            documents = documents.filter(id__in=authorized)
+
+        counts = documents.values('doc_type').annotate(count=Count('doc_type'))
+        return dict([(count['doc_type'], count['count']) for count in counts])
+
+    layers = Layer.objects.filter(title__icontains=title_filter)
+
+    if settings.RESOURCE_PUBLISHING:
+        layers = layers.filter(is_published=True)
+
+    if authorized is not None:
+        layers = layers.filter(id__in=authorized)
+
+    counts = layers.values('storeType').annotate(count=Count('storeType'))
+    count_dict = dict([(count['storeType'], count['count']) for count in counts])
+
+    facets = {
+        'raster': count_dict.get('coverageStore', 0),
+        'vector': count_dict.get('dataStore', 0),
+        'remote': count_dict.get('remoteStore', 0),
+        'wms': count_dict.get('wmsStore', 0),
+    }
+
+    if facet_type == 'layers':
+        return facets
+
+    types = {'map': Map, 'document': Document}
+    if settings.STORYSCAPES_ENABLED:
+        from exchange.storyscapes.models.base import Story
+        types['story'] = Story
+    ctypes = dict(
+        (ContentType.objects.get_for_model(model).id, name)
+        for name, model in types.items()
+    )
+
+    resources = ResourceBase.objects.filter(
+        title__icontains=title_filter,
+        polymorphic_ctype__in=ctypes.keys()
+    )
+    if authorized is not None:
+        resources = resources.filter(id__in=authorized)
+
+    for name in types:
+        facets[name] = 0
+    counts = resources.values('polymorphic_ctype').annotate(count=Count('id'))
+    for count in counts:
+        facets[ctypes[count['polymorphic_ctype']]] = count['count']
+
+    if facet_type == 'home':
+        facets['user'] = get_user_model().objects.exclude(
+            username='AnonymousUser').count()
+
+        facets['group'] = GroupProfile.objects.exclude(
+            access="private").count()
+
+        facets['layer'] = facets['raster'] + \
+            facets['vector'] + facets['remote'] + facets['wms']
+
+    return facets
+
+
+def connect_signals():
+    """invalidate the counts on the changes of the models they depend on"""
+    from geonode.documents.models import Document
+    from geonode.groups.models import GroupMember
+    from geonode.layers.models import Layer
+    from geonode.maps.models import Map
+    from guardian.models import GroupObjectPermission, UserObjectPermission
+    from exchange.storyscapes.models.base import Story
+
+    user_model = get_user_model()
+    senders = (ResourceBase, Layer, Map, Document, Story, GroupProfile,
+               GroupMember, user_model, UserObjectPermission,
+               GroupObjectPermission)
+    for sender in senders:
+        label = '%s.%s' % (sender._meta.app_label, sender._meta.model_name)
+        post_save.connect(invalidate_facets, sender=sender,
+                          dispatch_uid='exchange_facets_save_%s' % label)
+        post_delete.connect(invalidate_facets, sender=sender,
+                            dispatch_uid='exchange_facets_delete_%s' % label)
+    # permissions granted through the user's groups
+    m2m_changed.connect(invalidate_facets, sender=user_model.groups.through,
+                        dispatch_uid='exchange_facets_user_groups')
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2016 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+
+import hashlib
+import os
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from PIL import Image
+from resizeimage import resizeimage
+
+IMAGE_QUALITY = getattr(settings, 'IMAGE_QUALITY', 85)
+
+
+def _has_alpha(img):
+    return img.mode in ('RGBA', 'LA') or (
+        img.mode == 'P' and 'transparency' in img.info)
+
+
+def _resize(img, width, height):
+    if width is None:
+        return resizeimage.resize_height(img, height, validate=False)
+    return resizeimage.resize_cover(img, [width, height], validate=False)
+
+
+def _encode(img, format):
+    out = BytesIO()
+    if format == 'JPEG':
+        img.convert('RGB').save(out, format='JPEG', quality=IMAGE_QUALITY,
+                                optimize=True, progressive=True)
+    else:
+        img.save(out, format='PNG', optimize=True)
+    return out.getvalue()
+
+
+def optimize_image(storage, name, width, height):
+    """
+    Resize the image stored under name to the width x height it is
+    displayed at, or to height when width is None. It is written next to
+    the original as progressive JPEG, or PNG when the image has
+    transparency, under a name holding a hash of the source so it can be
+    cached forever.
+
+    Returns the name of the optimized image.
+    """
+    with storage.open(name) as fp:
+        data = fp.read()
+    src = Image.open(BytesIO(data))
+    src.load()
+
+    if _has_alpha(src):
+        format, ext = 'PNG', '.png'
+    else:
+        format, ext = 'JPEG', '.jpg'
+
+    digest = hashlib.md5(data + '%sx%s' % (width, height)).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(name))[0]
+    target = posixpath.join(posixpath.dirname(name),
+                            '%s.%s%s' % (stem, digest, ext))
+    # same hash, same content
+    if not storage.exists(target):
+        storage.save(target, ContentFile(_encode(_resize(src, width, height),
+                                                 format)))
+    return target
+
+
+def delete_unused(storage, name, queryset, fields):
+    """
+    Delete the stored image unless a row of the queryset still refers to it
+    in one of the fields. Optimized images are named after their content,
+    two uploads of the same image share one file.
+    """
+    query = Q()
+    for field in fields:
+        query |= Q(**{field: name})
+    if not queryset.filter(query).exists():
+        storage.delete(name)
+
+
+def should_retry(task, current, previous):
+    """
+    Whether a task that found its row without the uploaded image should be
+    retried: the save that scheduled it is not visible yet while the row
+    is missing or still has its previous image. A row that refers to
+    another image was changed since, there is nothing to wait for.
+    """
+    if task.request.retries >= task.max_retries:
+        return False
+    return not current or (current[0] or '') == (previous or '')
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2016 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+
+"""
+Per request timings of the database, Elasticsearch, outbound HTTP and
+template rendering, sent as a Server-Timing header and a structured log
+line. Requests are sampled, the hooks cost a thread local lookup on the
+requests that aren't.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from functools import wraps
+from urlparse import urlparse
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('exchange.instrumentation')
+
+_local = threading.local()
+
+
+class RequestTimings(object):
+
+    def __init__(self):
+        self.start = time.time()
+        self.calls = {}
+        self.hosts = {}
+        self.template_depth = 0
+
+    def add(self, category, seconds, count=1, host=None):
+        calls = self.calls.setdefault(category, [0, 0.0])
+        calls[0] += count
+        calls[1] += seconds
+        if host is not None:
+            calls = self.hosts.setdefault(host, [0, 0.0])
+            calls[0] += count
+            calls[1] += seconds
+
+    def as_dict(self):
+        data = dict(
+            (category, {'count': count, 'ms': round(seconds * 1000, 2)})
+            for category, (count, seconds) in self.calls.items()
+        )
+        if self.hosts:
+            data['http_hosts'] = dict(
+                (host, {'count': count, 'ms': round(seconds * 1000, 2)})
+                for host, (count, seconds) in self.hosts.items()
+            )
+        return data
+
+
+def current_timings():
+    """timings of the request being handled by the thread, if sampled"""
+    return getattr(_local, 'timings', None)
+
+
+def _timed(category, host_of=None):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = current_timings()
+            if timings is None:
+                return func(*args, **kwargs)
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                host = host_of(*args, **kwargs) if host_of else None
+                timings.add(category, time.time() - start, host=host)
+        wrapper._exchange_instrumented = True
+        return wrapper
+    return decorator
+
+
+def _host(url):
+    return urlparse(url).netloc or url
+
+
+def _patch(owner, name, category, host_of=None):
+    func = getattr(owner, name)
+    if not getattr(func, '_exchange_instrumented', False):
+        setattr(owner, name, _timed(category, host_of)(func))
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, *args, **kwargs):
+        timings = current_timings()
+        # nested templates are part of the outer render
+        if timings is None or timings.template_depth:
+            return render(self, *args, **kwargs)
+        timings.template_depth += 1
+        start = time.time()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timings.template_depth -= 1
+            timings.add('template', time.time() - start)
+    wrapper._exchange_instrumented = True
+    return wrapper
+
+
+_installed = []
+
+
+def install():
+    """wrap the Elasticsearch, HTTP client and template entry points"""
+    if _installed:
+        return
+    _installed.append(True)
+
+    from django.template.base import Template
+    if not getattr(Template.render, '_exchange_instrumented', False):
+        Template.render = _timed_render(Template.render)
+
+    try:
+        from elasticsearch.transport import Transport
+        _patch(Transport, 'perform_request', 'es')
+    except ImportError:
+        pass
+
+    try:
+        import requests
+        _patch(requests.Session, 'request', 'http',
+               lambda self, method, url, *args, **kwargs: _host(url))
+    except ImportError:
+        pass
+
+    try:
+        import httplib2
+        # geonode's http_client, used for geoserver
+        _patch(httplib2.Http, 'request', 'http',
+               lambda self, uri, *args, **kwargs: _host(uri))
+    except ImportError:
+        pass
+
+
+class InstrumentationMiddleware(object):
+    """
+    Times a sample of the requests, INSTRUMENTATION_SAMPLE_RATE of them.
+    Database queries are read from the debug cursor of the connections,
+    only turned on for the sampled requests.
+    """
+
+    def __init__(self):
+        self.sample_rate = getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 0)
+        self.server_timing = getattr(
+            settings, 'INSTRUMENTATION_SERVER_TIMING', True)
+        install()
+
+    def process_request(self, request):
+        _local.timings = None
+        if random.random() >= self.sample_rate:
+            return None
+
+        timings = RequestTimings()
+        timings.connections = []
+        for connection in connections.all():
+            timings.connections.append((
+                connection,
+                connection.force_debug_cursor,
+                len(connection.queries_log)
+            ))
+            connection.force_debug_cursor = True
+        _local.timings = timings
+        return None
+
+    def _collect_queries(self, timings):
+        for connection, force_debug_cursor, start in timings.connections:
+            connection.force_debug_cursor = force_debug_cursor
+            queries = list(connection.queries_log)[start:]
+            if queries:
+                timings.add('db', sum(float(q['time']) for q in queries),
+                            count=len(queries))
+
+    def process_response(self, request, response):
+        timings = current_timings()
+        if timings is None:
+            return response
+        _local.timings = None
+
+        self._collect_queries(timings)
+        total = time.time() - timings.start
+        data = timings.as_dict()
+
+        if self.server_timing:
+            metrics = [
+                '%s;dur=%.1f;desc="%d calls"' % (
+                    category, data[category]['ms'], data[category]['count'])
+                for category in ('db', 'es', 'http', 'template')
+                if category in data
+            ]
+            metrics.append('total;dur=%.1f' % (total * 1000))
+            response['Server-Timing'] = ', '.join(metrics)
+
+        data.update({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'ms': round(total * 1000, 2),
+        })
+        logger.info(json.dumps(data, sort_keys=True))
+        return response
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2016 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+
+"""
+Counters and histograms for the celery tasks, rendered in the Prometheus
+text format by the /metrics view. Values are kept in the default cache so
+that the web process can report what the workers recorded, which needs a
+cache shared between them (memcached, redis).
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from itertools import product
+
+from celery.signals import before_task_publish, task_prerun, task_postrun
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+
+logger = logging.getLogger(__name__)
+
+METRICS_CACHE_PREFIX = 'exchange_metrics'
+
+# tasks timed by the celery signal handlers
+TASK_METRICS_TASKS = getattr(
+    settings,
+    'TASK_METRICS_TASKS',
+    (
+        'exchange.tasks.create_record',
+        'exchange.tasks.delete_record',
+        'exchange.thumbnails.tasks.generate_thumbnail_task',
+    )
+)
+
+TASK_LABELS = tuple(name.rsplit('.', 1)[-1] for name in TASK_METRICS_TASKS)
+
+
+metrics = []
+
+
+def _incr(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+class Metric(object):
+    """
+    A metric family, labels is a sequence of (name, values) pairs which
+    lists every label value the family can be reported with. The metric
+    types define keys(), the cache keys of the family, and samples(values),
+    the (name, labels, value) lines rendered from those keys.
+    """
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        metrics.append(self)
+
+    def _key(self, suffix, labels):
+        return ':'.join(
+            [METRICS_CACHE_PREFIX, self.name + suffix] +
+            [unicode(labels[name]) for name, values in self.labels]
+        )
+
+    def _label_sets(self):
+        names = [name for name, values in self.labels]
+        for values in product(*[values for name, values in self.labels]):
+            yield dict(zip(names, values))
+
+    def _record(self, func, *args, **labels):
+        # metrics never fail the work they measure
+        try:
+            func(*args, **labels)
+        except Exception:
+            logger.exception('Could not record %s', self.name)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self._record(self._inc, amount, **labels)
+
+    def _inc(self, amount, **labels):
+        _incr(self._key('', labels), amount)
+
+    def keys(self):
+        return [self._key('', labels) for labels in self._label_sets()]
+
+    def samples(self, values):
+        for labels in self._label_sets():
+            yield self.name, labels, values.get(self._key('', labels), 0)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=()):
+        super(Histogram, self).__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        self._record(self._observe, value, **labels)
+
+    def _observe(self, value, **labels):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        _incr(self._key('_bucket:%d' % index, labels), 1)
+        _incr(self._key('_count', labels), 1)
+        # incr only takes integers, the sum is kept in millionths
+        _incr(self._key('_sum', labels), int(round(value * 1000000)))
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(time.time() - start, **labels)
+
+    def keys(self):
+        keys = []
+        for labels in self._label_sets():
+            keys.extend(self._key('_bucket:%d' % i, labels)
+                        for i in range(len(self.buckets) + 1))
+            keys.append(self._key('_count', labels))
+            keys.append(self._key('_sum', labels))
+        return keys
+
+    def samples(self, values):
+        for labels in self._label_sets():
+            count = 0
+            for i, bound in enumerate(self.buckets + (float('inf'),)):
+                count += values.get(self._key('_bucket:%d' % i, labels), 0)
+                le = '+Inf' if i == len(self.buckets) else repr(bound)
+                yield self.name + '_bucket', dict(labels, le=le), count
+            yield (self.name + '_count', labels,
+                   values.get(self._key('_count', labels), 0))
+            yield (self.name + '_sum', labels,
+                   values.get(self._key('_sum', labels), 0) / 1000000.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, unicode(value).replace('\\', r'\\')
+                     .replace('"', r'\"'))
+        for name, value in sorted(labels.items())
+    )
+
+
+def recording():
+    """
+    whether the default cache keeps the values at all, the dummy cache
+    drops them and every metric would be reported as 0
+    """
+    return not isinstance(caches['default'], DummyCache)
+
+
+def render():
+    """all the metrics in the Prometheus text exposition format"""
+    keys = []
+    for metric in metrics:
+        keys.extend(metric.keys())
+    values = cache.get_many(keys)
+
+    lines = []
+    for metric in metrics:
+        lines.append('# HELP %s %s' % (metric.name, metric.documentation))
+        lines.append('# TYPE %s %s' % (metric.name, metric.type))
+        for name, labels, value in metric.samples(values):
+            lines.append('%s%s %s' % (name, _format_labels(labels), value))
+    return '\n'.join(lines) + '\n'
+
+
+task_queue_wait = Histogram(
+    'exchange_task_queue_wait_seconds',
+    'Time from publishing a task to a worker starting it.',
+    labels=(('task', TASK_LABELS),),
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+)
+task_runtime = Histogram(
+    'exchange_task_runtime_seconds',
+    'Time a worker spent running a task.',
+    labels=(('task', TASK_LABELS),),
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+task_results = Counter(
+    'exchange_task_results_total',
+    'Task runs by final state, retry counts the runs that were retried.',
+    labels=(('task', TASK_LABELS),
+            ('state', ('success', 'failure', 'retry')))
+)
+thumbnail_poll_attempts = Histogram(
+    'exchange_thumbnail_poll_attempts',
+    'GeoServer requests made for a thumbnail, by outcome.',
+    labels=(('outcome', ('image', 'error', 'timeout')),),
+    buckets=(1, 2, 3, 5, 10, 20, 30)
+)
+csw_transaction = Histogram(
+    'exchange_csw_transaction_seconds',
+    'Latency of the CSW transactions made for service records.',
+    labels=(('operation', ('create', 'delete')),),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+
+def _sent_key(task_id):
+    return '%s:sent:%s' % (METRICS_CACHE_PREFIX, task_id)
+
+
+_started = {}
+
+
+@before_task_publish.connect(dispatch_uid='exchange_metrics_publish')
+def _task_published(sender=None, body=None, **kwargs):
+    # tasks with an eta (countdowns, retries) wait on purpose
+    if sender not in TASK_METRICS_TASKS or not body or body.get('eta'):
+        return
+    try:
+        cache.set(_sent_key(body['id']), time.time(), 86400)
+    except Exception:
+        logger.exception('Could not record the publish time of a task')
+
+
+@task_prerun.connect(dispatch_uid='exchange_metrics_prerun')
+def _task_started(sender=None, task_id=None, **kwargs):
+    if sender is None or sender.name not in TASK_METRICS_TASKS:
+        return
+    now = time.time()
+    _started[task_id] = now
+    try:
+        sent = cache.get(_sent_key(task_id))
+        if sent is not None:
+            cache.delete(_sent_key(task_id))
+    except Exception:
+        logger.exception('Could not read the publish time of a task')
+        sent = None
+    if sent is not None:
+        task_queue_wait.observe(max(now - sent, 0),
+                                task=sender.name.rsplit('.', 1)[-1])
+
+
+@task_postrun.connect(dispatch_uid='exchange_metrics_postrun')
+def _task_finished(sender=None, task_id=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is None:
+        return
+    name = sender.name.rsplit('.', 1)[-1]
+    task_runtime.observe(time.time() - started, task=name)
+    state = (state or '').lower()
+    if state in ('success', 'failure', 'retry'):
+        task_results.inc(task=name, state=state)
@@ -21,10 +21,6 @@
 from django.db import models
 from solo.models import SingletonModel
 from django.conf import settings
-from PIL import Image
-from io import BytesIO
-from django.core.files.base import ContentFile
-from resizeimage import resizeimage
 from django import forms
 import os
 import uuid
@@ -42,26 +38,19 @@ class ThumbnailImage(SingletonModel):
     )
 
     def save(self, *args, **kwargs):
-        pil_image_obj = Image.open(self.thumbnail_image)
-        new_image = resizeimage.resize_cover(
-            pil_image_obj,
-            [250, 150],
-            validate=False
-        )
-
-        new_image_io = BytesIO()
-        new_image.save(new_image_io, format='PNG')
-
-        temp_name = self.thumbnail_image.name
-        self.thumbnail_image.delete(save=False)
-
-        self.thumbnail_image.save(
-            temp_name,
-            content=ContentFile(new_image_io.getvalue()),
-            save=False
-        )
-
+        """
+        Saves the upload as is and queues its processing.
+        """
+        from exchange.core.tasks import process_thumbnail_image
+
+        changed = self.thumbnail_image and \
+            not self.thumbnail_image._committed
+        previous = ThumbnailImage.objects.filter(pk=self.pk).values_list(
+            'thumbnail_image', flat=True).first() if changed else None
         super(ThumbnailImage, self).save(*args, **kwargs)
+        if changed:
+            process_thumbnail_image.delay(self.thumbnail_image.name,
+                                          previous)
 
 
 class ThumbnailImageForm(forms.Form):
@@ -189,4 +178,4 @@ class CSWRecordReference(models.Model):
                       ('OGC:WPS', 'WPS'))
     record = models.ForeignKey(CSWRecord, related_name="references")
     scheme = models.CharField(verbose_name='Service Type', choices=scheme_choices, max_length=100)
-    url = models.URLField(max_length=512, blank=False)
\ No newline at end of file
+    url = models.URLField(max_length=512, blank=False)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2016 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+
+from django.conf import settings
+
+
+class TaskRouter(object):
+    """
+    Routes tasks with CELERY_TASK_QUEUES, which maps task and module names
+    to the queue and priority of their tasks. A task takes the entry of its
+    own name, or else of the closest module it is in.
+    """
+
+    def route_for_task(self, task, args=None, kwargs=None):
+        routes = getattr(settings, 'CELERY_TASK_QUEUES', {})
+        name = task
+        while name:
+            if name in routes:
+                return dict(routes[name])
+            name = name.rpartition('.')[0]
+        return None
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2016 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+import logging
+import threading
+from collections import OrderedDict
+
+from celery.signals import task_prerun, task_postrun
+from django.conf import settings
+from django.core.signals import request_started, request_finished
+from django.db.models import signals
+from haystack.exceptions import NotHandled
+from haystack.signals import BaseSignalProcessor
+
+logger = logging.getLogger(__name__)
+
+# seconds a queued batch waits before it is indexed
+HAYSTACK_QUEUE_DELAY = getattr(settings, 'HAYSTACK_QUEUE_DELAY', 5)
+# pending objects that force a batch out before the request or task ends
+HAYSTACK_QUEUE_BATCH_SIZE = getattr(settings, 'HAYSTACK_QUEUE_BATCH_SIZE', 500)
+
+UPDATE = 'update'
+DELETE = 'delete'
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """
+    Haystack signal processor that queues index updates instead of posting
+    them to the search backend inside the request.
+
+    Saves and deletes are collected per object (the last action wins) for
+    the rest of the request or celery task, then handed to the
+    update_search_index task in one batch, which indexes each model with a
+    single bulk request. Outside of a request or task (management commands,
+    the shell, scripts) nothing marks the end of the work, so updates are
+    handed over as they happen.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._local = threading.local()
+        super(QueuedSignalProcessor, self).__init__(*args, **kwargs)
+
+    def setup(self):
+        signals.post_save.connect(self.handle_save)
+        signals.post_delete.connect(self.handle_delete)
+        request_started.connect(self.start)
+        task_prerun.connect(self.start)
+        request_finished.connect(self.finish)
+        task_postrun.connect(self.finish)
+
+    def teardown(self):
+        signals.post_save.disconnect(self.handle_save)
+        signals.post_delete.disconnect(self.handle_delete)
+        request_started.disconnect(self.start)
+        task_prerun.disconnect(self.start)
+        request_finished.disconnect(self.finish)
+        task_postrun.disconnect(self.finish)
+
+    def start(self, **kwargs):
+        """hold the updates until the request or task finishes"""
+        self._local.batching = True
+
+    def finish(self, **kwargs):
+        self._local.batching = False
+        self.flush()
+
+    @property
+    def pending(self):
+        if not hasattr(self._local, 'pending'):
+            self._local.pending = OrderedDict()
+        return self._local.pending
+
+    def handle_save(self, sender, instance, **kwargs):
+        self.enqueue(sender, instance, UPDATE)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        self.enqueue(sender, instance, DELETE)
+
+    def enqueue(self, sender, instance, action):
+        if instance.pk is None:
+            return
+        for using in self.connection_router.for_write(instance=instance):
+            try:
+                self.connections[using].get_unified_index().get_index(sender)
+            except NotHandled:
+                continue
+            key = (using, sender._meta.app_label, sender._meta.model_name,
+                   instance.pk)
+            self.pending[key] = action
+        if not getattr(self._local, 'batching', False) or \
+                len(self.pending) >= HAYSTACK_QUEUE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self, **kwargs):
+        """send the pending updates of this thread to the index task"""
+        if not self.pending:
+            return
+        from .tasks import update_search_index
+
+        updates = [key + (action, ) for key, action in self.pending.items()]
+        self._local.pending = OrderedDict()
+        logger.debug('Queueing %d search index updates.', len(updates))
+        update_search_index.apply_async(
+            args=(updates, ),
+            countdown=HAYSTACK_QUEUE_DELAY
+        )
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2016 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+import csv
+
+
+class Echo(object):
+    """file-like object that hands the written line back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def csv_writer():
+    """
+    csv writer whose writerow returns the formatted line instead of
+    writing it, for responses and exports streamed one row at a time.
+    """
+    return csv.writer(Echo())
+
+
+def csv_value(value):
+    """value as the python 2 csv writer takes it, unicode as utf-8"""
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
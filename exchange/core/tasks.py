@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2016 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+from collections import OrderedDict
+
+from celery.task import task
+from celery.utils.log import get_task_logger
+from django.apps import apps
+
+logger = get_task_logger(__name__)
+
+
+@task(
+    bind=True,
+    max_retries=1,
+)
+def update_search_index(self, updates):
+    """
+    Apply a batch of queued search index updates, given as
+    (using, app_label, model_name, pk, action) tuples. Updated objects are
+    loaded through their index queryset and sent with one bulk request per
+    model, objects that left the index queryset are removed. The updates of
+    the models that failed are retried.
+    """
+    from haystack import connections
+
+    grouped = OrderedDict()
+    for using, app_label, model_name, pk, action in updates:
+        updated, deleted = grouped.setdefault(
+            (using, app_label, model_name),
+            (set(), set())
+        )
+        if action == 'delete':
+            deleted.add(pk)
+        else:
+            updated.add(pk)
+
+    failed = []
+    error = None
+    for (using, app_label, model_name), (updated, deleted) in \
+            grouped.items():
+        try:
+            model = apps.get_model(app_label, model_name)
+            backend = connections[using].get_backend()
+            index = connections[using].get_unified_index().get_index(model)
+            if updated:
+                objs = list(index.index_queryset(using=using).filter(
+                    pk__in=updated
+                ))
+                deleted |= updated - set(obj.pk for obj in objs)
+                objs = [obj for obj in objs if index.should_update(obj)]
+                if objs:
+                    backend.update(index, objs)
+            for pk in deleted:
+                backend.remove('%s.%s.%s' % (app_label, model_name, pk))
+            logger.debug('Indexed %d and removed %d %s.%s objects.',
+                         len(updated - deleted), len(deleted),
+                         app_label, model_name)
+        except Exception as e:
+            logger.exception('Could not update the search index for %s.%s',
+                             app_label, model_name)
+            error = e
+            failed.extend(
+                (using, app_label, model_name, pk, 'update')
+                for pk in updated - deleted
+            )
+            failed.extend(
+                (using, app_label, model_name, pk, 'delete')
+                for pk in deleted
+            )
+
+    if failed:
+        raise self.retry(args=(failed, ), exc=error)
+
+
+@task(
+    ignore_result=True,
+)
+def flush_popular_counts():
+    """
+    Write the resource view counts kept in the cache, run by celery beat
+    every POPULAR_COUNT_FLUSH_INTERVAL seconds.
+    """
+    from exchange.core import counters
+
+    views = counters.flush_popular_counts()
+    logger.debug('Wrote %d resource views.', views)
+
+
+@task(
+    max_retries=5,
+    default_retry_delay=5,
+)
+def process_thumbnail_image(name, previous=None):
+    """
+    Replace the uploaded site thumbnail image by its optimized version.
+    The images no thumbnail refers to anymore are deleted.
+    """
+    from exchange.core.images import (delete_unused, optimize_image,
+                                      should_retry)
+    from exchange.core.models import ThumbnailImage
+
+    storage = ThumbnailImage._meta.get_field('thumbnail_image').storage
+    try:
+        optimized = optimize_image(storage, name, 250, 150)
+    except IOError:
+        logger.warn('Unable to process thumbnail image %s', name)
+        return
+
+    fields = ('thumbnail_image',)
+    updated = ThumbnailImage.objects.filter(
+        thumbnail_image=name
+    ).update(thumbnail_image=optimized)
+    if not updated:
+        current = list(ThumbnailImage.objects.values_list(
+            'thumbnail_image', flat=True))
+        if should_retry(process_thumbnail_image, current, previous):
+            raise process_thumbnail_image.retry()
+        logger.debug('Thumbnail image %s was replaced', name)
+        delete_unused(storage, optimized, ThumbnailImage.objects.all(),
+                      fields)
+    delete_unused(storage, name, ThumbnailImage.objects.all(), fields)
@@ -3,16 +3,27 @@ from osgeo_importer.handlers import ImportHandlerMixin
 from osgeo_importer.handlers import ensure_can_run
 from geonode.layers.models import Layer
 
+# layer fields the other exchange handlers record in the layer config for
+# this handler to apply
+LAYER_CONFIG_FIELDS = ('temporal_extent_start', 'temporal_extent_end')
+
+
 class GeoNodePostImportHandler(ImportHandlerMixin):
     """
-    Save the geonode layer after import to trigger post save actions.
+    Finalizes the geonode layer after import. The changes the other exchange
+    handlers recorded in the layer config are applied in a single save,
+    which triggers the post save actions (search index, audit, thumbnail)
+    once per import.
     """
 
     def can_run(self, layer, layer_config, *args, **kwargs):
-        self.geonode_layer = Layer.objects.get(name=layer)
         return True
 
     @ensure_can_run
     def handle(self, layer, layer_config, *args, **kwargs):
-        self.geonode_layer.save()
+        geonode_layer = Layer.objects.get(name=layer)
+        for field in LAYER_CONFIG_FIELDS:
+            if field in layer_config:
+                setattr(geonode_layer, field, layer_config[field])
+        geonode_layer.save()
         return 'Layer Saved'
@@ -1,3 +1,4 @@
+import hashlib
 import logging
 from django import db
 from django.conf import settings
@@ -5,7 +6,6 @@ from osgeo_importer.handlers import ImportHandlerMixin
 from osgeo_importer.handlers import ensure_can_run
 from osgeo_importer.models import UploadLayer
 from osgeo_importer.utils import quote_ident
-from geonode.layers.models import Layer
 from osgeo_importer.handlers.geonode.backward_compatibility import set_attributes
 from django.contrib.auth import get_user_model
 
@@ -13,6 +13,36 @@ User = get_user_model()
 logger = logging.getLogger(__name__)
 logger.setLevel('DEBUG')
 
+# index the time columns of imported tables. the extent is then read from
+# both ends of the indexes instead of a sequential scan of the table, and
+# the TIME filters of the layer use them too. when off, the extent is
+# computed by one scan of the table
+IMPORT_TIME_INDEX = getattr(settings, 'IMPORT_TIME_INDEX', True)
+
+
+def ensure_time_index(cursor, table, column):
+    """
+    Create a btree index on the column of the imported table, unless an
+    index already starts with it.
+    """
+    cursor.execute(
+        'SELECT 1 FROM pg_index i JOIN pg_attribute a'
+        ' ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]'
+        ' WHERE i.indrelid = %s::regclass AND a.attname = %s',
+        [quote_ident(table), column]
+    )
+    if cursor.fetchone():
+        return
+
+    name = '%s_%s_idx' % (table, column)
+    if len(name) > 63:
+        # postgres truncates identifiers to 63 bytes
+        name = '%s_%s_idx' % (
+            name[:50], hashlib.md5(name.encode('utf-8')).hexdigest()[:8])
+    logger.debug('Creating index %s', name)
+    cursor.execute('CREATE INDEX %s ON %s (%s);' % (
+        quote_ident(name), quote_ident(table), quote_ident(column)))
+
 
 class GeoNodeTimeExtentHandler(ImportHandlerMixin):
     """
@@ -21,7 +51,6 @@ class GeoNodeTimeExtentHandler(ImportHandlerMixin):
 
     def can_run(self, layer, layer_config, *args, **kwargs):
         """
-        Check that geonode layer already exists
         Check that start or end time column exists
         """
         if layer_config['raster']:
@@ -31,15 +60,15 @@ class GeoNodeTimeExtentHandler(ImportHandlerMixin):
         self.has_end = 'end_date' in layer_config and layer_config['end_date'] != None
         logger.debug('Can run for Configuring time extent for %s. has_start=%s, has_end=%s',
                      layer, self.has_start, self.has_end)
-        self.geonode_layer = Layer.objects.get(name=layer)
 
-        return (self.geonode_layer and (self.has_start or self.has_end))
+        return self.has_start or self.has_end
 
     @ensure_can_run
     def handle(self, layer, layer_config, *args, **kwargs):
         """
-        Gets existing geonode layer and configures time extents
-        by querying postgresql data table
+        Computes the time extent of the layer from the postgresql data
+        table. It is only recorded in the layer config, the post-import
+        handler applies it with the single save of the layer.
         """
 
         # Configure time extent
@@ -58,30 +87,34 @@ class GeoNodeTimeExtentHandler(ImportHandlerMixin):
         scrub_layer_name = quote_ident(layer)
         logger.debug('Getting min/max for %s', scrub_layer_name)
 
-        mint = None
-        maxt = None
-
         if self.has_start and self.has_end:
-            query = 'SELECT min(%s), max(%s) FROM %s;' % (start_date_col,
-                                                            end_date_col,
-                                                            scrub_layer_name)
+            min_col, max_col = start_date_col, end_date_col
+            columns = [layer_config['start_date'], layer_config['end_date']]
         elif self.has_start:
-            query = 'SELECT min(%s), max(%s) FROM %s;' % (start_date_col,
-                                                            start_date_col,
-                                                            scrub_layer_name)
-        elif self.has_end:
-            query = 'SELECT min(%s), max(%s) FROM %s;' % (end_date_col,
-                                                            end_date_col,
-                                                            scrub_layer_name)
+            min_col = max_col = start_date_col
+            columns = [layer_config['start_date']]
+        else:
+            min_col = max_col = end_date_col
+            columns = [layer_config['end_date']]
+
+        if IMPORT_TIME_INDEX:
+            for column in columns:
+                ensure_time_index(cursor, layer, column)
+
+        # with the indexes postgres reads min and max from their first and
+        # last entries, otherwise both come from a single scan of the table
+        query = 'SELECT min(%s), max(%s) FROM %s;' % (min_col,
+                                                        max_col,
+                                                        scrub_layer_name)
         cursor.execute(query)
         mint, maxt = cursor.fetchone()
 
-
         logger.debug('mint %s maxt %s', mint, maxt)
 
-        self.geonode_layer.temporal_extent_start = mint
-        self.geonode_layer.temporal_extent_end = maxt
-        self.geonode_layer.save()
+        # kept serializable, the layer config is part of the task result
+        layer_config['temporal_extent_start'] = \
+            mint.isoformat() if mint else None
+        layer_config['temporal_extent_end'] = \
+            maxt.isoformat() if maxt else None
 
-        
         return 'Temporal Extent Configured'
@@ -0,0 +1,85 @@
+import logging
+
+from celery import chain, group
+from celery.task import task
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# most layers of one upload imported at the same time
+IMPORT_CONCURRENCY = getattr(settings, 'IMPORT_CONCURRENCY', 4)
+
+ERROR_TIMEOUT = 60 * 60 * 24
+
+
+def _error_key(upload_layer_id):
+    return 'exchange_import_error:%s' % upload_layer_id
+
+
+def set_status(upload_layer_ids, status):
+    """
+    Record the import status of upload layers on their UploadLayer rows,
+    with the celery state names the upload UI already knows: PENDING,
+    STARTED, SUCCESS or FAILURE.
+    """
+    from osgeo_importer.models import UploadLayer
+
+    UploadLayer.objects.filter(
+        id__in=upload_layer_ids
+    ).update(import_status=status)
+
+
+def get_errors(upload_layer_ids):
+    """error message of each failed layer import, by upload layer id"""
+    found = cache.get_many([_error_key(i) for i in upload_layer_ids])
+    return dict(
+        (i, found[_error_key(i)]) for i in upload_layer_ids
+        if _error_key(i) in found
+    )
+
+
+@task()
+def import_upload_layer(upload_layer_id, configuration_options):
+    """
+    Import one layer of an upload. The import handlers run in their
+    configured order, within the task.
+    """
+    from osgeo_importer.models import UploadLayer
+    from osgeo_importer.tasks import import_object
+
+    upload_layer = UploadLayer.objects.get(id=upload_layer_id)
+    options = dict(configuration_options, upload_layer_id=upload_layer_id)
+
+    set_status([upload_layer_id], 'STARTED')
+    try:
+        import_object(upload_layer.upload_file.id, options)
+    except Exception as e:
+        logger.exception('Import of upload layer %s failed', upload_layer_id)
+        set_status([upload_layer_id], 'FAILURE')
+        cache.set(_error_key(upload_layer_id), unicode(e), ERROR_TIMEOUT)
+        # a failed layer doesn't stop the others of its lane
+        return None
+    set_status([upload_layer_id], 'SUCCESS')
+    return upload_layer_id
+
+
+def import_layers(configs, concurrency=None):
+    """
+    Import the layers of an upload in parallel, given as (upload layer id,
+    configuration options) pairs. The layers are spread over at most
+    concurrency chains run as a celery group, so that many layers are
+    imported at once. Returns the group result.
+    """
+    concurrency = max(1, concurrency or IMPORT_CONCURRENCY)
+    lanes = [configs[i::concurrency] for i in xrange(concurrency)]
+
+    ids = [upload_layer_id for upload_layer_id, _ in configs]
+    cache.delete_many([_error_key(i) for i in ids])
+    set_status(ids, 'PENDING')
+
+    return group(
+        chain(*[import_upload_layer.si(upload_layer_id, options)
+                for upload_layer_id, options in lane])
+        for lane in lanes if lane
+    ).apply_async()
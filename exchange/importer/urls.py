@@ -0,0 +1,8 @@
+from django.conf.urls import url
+
+from .views import upload_layers_import
+
+urlpatterns = (
+    url(r'^importer-api/uploads/(?P<upload_id>\d+)/import$',
+        upload_layers_import, name='upload_layers_import'),
+)
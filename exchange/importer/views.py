@@ -0,0 +1,55 @@
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_http_methods
+
+from exchange.importer.tasks import get_errors, import_layers
+
+
+def _upload_layers(request, upload_id):
+    from osgeo_importer.models import UploadLayer
+
+    return UploadLayer.objects.filter(
+        upload_id=upload_id,
+        upload__user=request.user
+    )
+
+
+@login_required
+@require_http_methods(['GET', 'POST'])
+def upload_layers_import(request, upload_id):
+    """
+    POST starts the import of the layers of an upload, with a list of
+    {"upload_layer_id": id, "config": {...}} in the body.
+    GET returns the import status of each layer, kept on its UploadLayer,
+    and the error of the failed ones.
+    """
+    upload_layers = _upload_layers(request, upload_id)
+    ids = set(upload_layers.values_list('id', flat=True))
+    if not ids:
+        return HttpResponse(status=404)
+
+    if request.method == 'POST':
+        try:
+            body = json.loads(request.body)
+            configs = [(int(c['upload_layer_id']), c.get('config') or {})
+                       for c in body]
+        except (ValueError, TypeError, KeyError) as e:
+            return HttpResponse(unicode(e), status=400)
+        unknown = [i for i, _ in configs if i not in ids]
+        if unknown:
+            return HttpResponse(
+                'Unknown upload layers: %s' % unknown, status=400)
+        result = import_layers(configs)
+        return JsonResponse({'id': result.id}, status=202)
+
+    errors = get_errors(ids)
+    return JsonResponse({'layers': [
+        {
+            'id': ul.id,
+            'layer_name': ul.layer_name,
+            'import_status': ul.import_status,
+            'error': errors.get(ul.id),
+        } for ul in upload_layers.order_by('id')
+    ]})
@@ -22,6 +22,8 @@ import os
 import dj_database_url
 import copy
 from ast import literal_eval as le
+from datetime import timedelta
+from kombu import Exchange, Queue
 from geonode.settings import *  # noqa
 from geonode.settings import (
     MIDDLEWARE_CLASSES,
@@ -157,6 +159,16 @@ MIDDLEWARE_CLASSES = (
     'whitenoise.middleware.WhiteNoiseMiddleware',
 ) + MIDDLEWARE_CLASSES
 
+# share of the requests timed by the instrumentation middleware, 0 to 1
+INSTRUMENTATION_SAMPLE_RATE = float(
+    os.getenv('INSTRUMENTATION_SAMPLE_RATE', '0'))
+INSTRUMENTATION_SERVER_TIMING = str2bool(
+    os.getenv('INSTRUMENTATION_SERVER_TIMING', 'True'))
+if INSTRUMENTATION_SAMPLE_RATE > 0:
+    MIDDLEWARE_CLASSES = (
+        'exchange.core.instrumentation.InstrumentationMiddleware',
+    ) + MIDDLEWARE_CLASSES
+
 ADDITIONAL_APPS = os.getenv(
     'ADDITIONAL_APPS',
     ()
@@ -297,6 +309,20 @@ DATABASES['exchange_imports'] = dj_database_url.parse(
 )
 DATABASES['exchange_imports']['ENGINE'] = 'django.contrib.gis.db.backends.postgis'
 
+# cache shared by the web and worker processes. the active theme version,
+# the story config versions, view counts, import progress and task metrics
+# are kept there, so every process has to reach the same cache. a process
+# local one (locmem, dummy, or a file cache on several hosts) leaves each
+# process with its own copy and the others never see its changes.
+CACHES = locals().get('CACHES', {})
+CACHES['default'] = {
+    'BACKEND': os.getenv(
+        'CACHE_BACKEND',
+        'django.core.cache.backends.memcached.MemcachedCache'
+    ),
+    'LOCATION': os.getenv('CACHE_LOCATION', '127.0.0.1:11211'),
+}
+
 WGS84_MAP_CRS = str2bool(os.getenv('WGS84_MAP_CRS', 'False'))
 if WGS84_MAP_CRS:
     DEFAULT_MAP_CRS = "EPSG:4326"
@@ -337,7 +363,17 @@ if ES_UNIFIED_SEARCH:
     HAYSTACK_SEARCH = True
     HAYSTACK_FACET_COUNTS = True
 if HAYSTACK_SEARCH:
-    HAYSTACK_SIGNAL_PROCESSOR = 'haystack.signals.RealtimeSignalProcessor'
+    # index updates are queued and sent in bulk by a celery task,
+    # set to haystack.signals.RealtimeSignalProcessor to index inline
+    HAYSTACK_SIGNAL_PROCESSOR = os.getenv(
+        'HAYSTACK_SIGNAL_PROCESSOR',
+        'exchange.core.signals.QueuedSignalProcessor'
+    )
+    HAYSTACK_QUEUE_DELAY = le(os.getenv('HAYSTACK_QUEUE_DELAY', '5'))
+    HAYSTACK_QUEUE_BATCH_SIZE = le(os.getenv(
+        'HAYSTACK_QUEUE_BATCH_SIZE',
+        '500'
+    ))
     HAYSTACK_CONNECTIONS = {
         'default': {
             'ENGINE': ES_ENGINE,
@@ -359,11 +395,53 @@ SKIP_CELERY_TASK = False
 CELERY_DEFAULT_EXCHANGE = 'exchange'
 CELERYBEAT_SCHEDULER = 'djcelery.schedulers.DatabaseScheduler'
 CELERY_RESULT_BACKEND = 'rpc' + BROKER_URL[4:]
-CELERYD_PREFETCH_MULTIPLIER = 25
+# long tasks (imports, thumbnail polling) should not be prefetched behind
+# each other, the worker profiles in docker/home/worker.sh set this per queue
+CELERYD_PREFETCH_MULTIPLIER = le(
+    os.getenv('CELERYD_PREFETCH_MULTIPLIER', '4'))
 CELERY_TASK_RESULT_EXPIRES = 18000  # 5 hours.
 CELERY_ENABLE_UTC = False
 CELERY_TIMEZONE = TIME_ZONE
-CELERY_IMPORTS += ('exchange.tasks',)
+CELERY_IMPORTS += ('exchange.tasks', 'exchange.core.tasks',
+                   'exchange.themes.tasks',)
+
+# imports, csw publishing and thumbnails have their own queues and workers
+# so that a backlog of one does not hold up the others, the priorities
+# (0 to 9, 9 first) put user facing work ahead within a queue
+# the default worker profile of docker/home/worker.sh reads the same
+# CELERY_DEFAULT_QUEUE variable
+CELERY_DEFAULT_QUEUE = os.getenv(
+    'CELERY_DEFAULT_QUEUE', locals().get('CELERY_DEFAULT_QUEUE', 'celery'))
+CELERY_DEFAULT_ROUTING_KEY = locals().get(
+    'CELERY_DEFAULT_ROUTING_KEY', CELERY_DEFAULT_QUEUE)
+EXCHANGE_TASK_QUEUES = ('imports', 'csw', 'thumbnails')
+CELERY_QUEUES = list(locals().get('CELERY_QUEUES', ()))
+if CELERY_DEFAULT_QUEUE not in [queue.name for queue in CELERY_QUEUES]:
+    CELERY_QUEUES.append(Queue(
+        CELERY_DEFAULT_QUEUE,
+        Exchange(CELERY_DEFAULT_EXCHANGE, type='direct'),
+        routing_key=CELERY_DEFAULT_ROUTING_KEY
+    ))
+CELERY_QUEUES += [
+    Queue(name, Exchange(CELERY_DEFAULT_EXCHANGE, type='direct'),
+          routing_key=name, queue_arguments={'x-max-priority': 10})
+    for name in EXCHANGE_TASK_QUEUES
+]
+CELERY_ROUTES = ('exchange.core.routing.TaskRouter',)
+CELERY_TASK_QUEUES = {
+    'osgeo_importer.tasks': {'queue': 'imports', 'priority': 7},
+    'exchange.importer.tasks': {'queue': 'imports', 'priority': 9},
+    'exchange.tasks': {'queue': 'csw', 'priority': 7},
+    'exchange.thumbnails.tasks': {'queue': 'thumbnails', 'priority': 1},
+    'exchange.core.tasks.process_thumbnail_image': {
+        'queue': 'thumbnails', 'priority': 5},
+    'exchange.themes.tasks': {'queue': 'thumbnails', 'priority': 5},
+}
+
+# task metrics, kept in the default cache which has to be shared with the
+# workers, served at /metrics to requests with the token as bearer token
+METRICS_ENABLED = str2bool(os.getenv('METRICS_ENABLED', 'False'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', None)
 
 # audit settings
 AUDIT_ENABLED = str2bool(os.getenv('AUDIT_ENABLED', 'True'))
@@ -377,6 +455,33 @@ if AUDIT_ENABLED:
         'AUDIT_LOGFILE_LOCATION',
         os.path.join(LOCAL_ROOT, 'exchange_audit_log.json')
     )
+    # rotated by size (bytes) and interval (seconds), 0 disables either
+    AUDIT_LOGFILE_MAX_BYTES = le(os.getenv(
+        'AUDIT_LOGFILE_MAX_BYTES',
+        '104857600'
+    ))
+    AUDIT_LOGFILE_ROTATE_INTERVAL = le(os.getenv(
+        'AUDIT_LOGFILE_ROTATE_INTERVAL',
+        '86400'
+    ))
+    # rotated segments kept, 0 keeps all of them
+    AUDIT_LOGFILE_BACKUP_COUNT = le(os.getenv(
+        'AUDIT_LOGFILE_BACKUP_COUNT',
+        '5'
+    ))
+    # models audited on save/delete, as app_label.ModelName
+    AUDIT_MODELS = os.getenv(
+        'AUDIT_MODELS',
+        ('base.ContactRole', 'documents.Document', 'layers.Layer', 'maps.Map')
+    )
+    if isinstance(AUDIT_MODELS, str):
+        AUDIT_MODELS = tuple(map(str.strip, AUDIT_MODELS.split(',')))
+    # events older than this are moved out by archive_audit_events
+    AUDIT_RETENTION_DAYS = le(os.getenv('AUDIT_RETENTION_DAYS', '365'))
+    AUDIT_ARCHIVE_LOCATION = os.getenv(
+        'AUDIT_ARCHIVE_LOCATION',
+        os.path.join(LOCAL_ROOT, 'audit_archive')
+    )
 
 # Logging settings
 # 'DEBUG', 'INFO', 'WARNING', 'ERROR', or 'CRITICAL'
@@ -472,7 +577,7 @@ if 'osgeo_importer' in INSTALLED_APPS:
         'True'
     ))
     # Tell celery to load its tasks
-    CELERY_IMPORTS += ('osgeo_importer.tasks',)
+    CELERY_IMPORTS += ('osgeo_importer.tasks', 'exchange.importer.tasks',)
     # override GeoNode setting so importer UI can see when tasks finish
     CELERY_IGNORE_RESULT = False
     IMPORT_HANDLERS = [
@@ -492,6 +597,11 @@ if 'osgeo_importer' in INSTALLED_APPS:
         'exchange.importer.geonode_timeextent_handler.GeoNodeTimeExtentHandler',
         'exchange.importer.geonode_postimport_handler.GeoNodePostImportHandler',
     ]
+    # layers of an upload imported at the same time
+    IMPORT_CONCURRENCY = le(os.getenv('IMPORT_CONCURRENCY', '4'))
+    # index the time columns of imported tables, the time extent is read
+    # from the indexes instead of a scan of the table
+    IMPORT_TIME_INDEX = str2bool(os.getenv('IMPORT_TIME_INDEX', 'True'))
     PROJECTION_DIRECTORY = os.path.join(
         os.path.dirname(pyproj.__file__),
         'data/'
@@ -531,6 +641,24 @@ if SITEURL.startswith('https'):
 
 ACCOUNT_EMAIL_UNIQUE = str2bool(os.getenv('ACCOUNT_EMAIL_UNIQUE', 'True'))
 
+# seconds resource view counts are held in the cache before celery beat
+# writes them
+POPULAR_COUNT_FLUSH_INTERVAL = le(os.getenv(
+    'POPULAR_COUNT_FLUSH_INTERVAL',
+    '60'
+))
+CELERYBEAT_SCHEDULE = locals().get('CELERYBEAT_SCHEDULE', {})
+CELERYBEAT_SCHEDULE['flush-popular-counts'] = {
+    'task': 'exchange.core.tasks.flush_popular_counts',
+    'schedule': timedelta(seconds=POPULAR_COUNT_FLUSH_INTERVAL),
+}
+
+# seconds the resource facet counts are cached for
+FACETS_CACHE_TIMEOUT = le(os.getenv(
+    'FACETS_CACHE_TIMEOUT',
+    '60'
+))
+
 if ENABLE_SOCIAL_LOGIN:
     SOCIAL_AUTH_NEW_USER_REDIRECT_URL = '/'
 
@@ -9,6 +9,13 @@ MEDIA_ROOT = os.path.join(BASE_DIR, '../.storage/media')
 # ensures tests are run on writing to file
 AUDIT_TO_FILE = True
 
+# tests run in a single process, no shared cache is needed
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
 FILESERVICE_CONFIG = {
     'store_dir': os.path.join(MEDIA_ROOT, 'fileservice'),
     'types_allowed': ['.jpg', '.jpeg', '.png'],
@@ -1,13 +1,15 @@
-from django.db import transaction
 from django.http import HttpResponse
 from exchange.storyscapes.models.marker import Marker
 from .forms import MarkerForm
-from exchange.storyscapes.utils import unicode_csv_dict_reader
+from exchange.storyscapes.bulk import bulk_write, get_progress
+from exchange.storyscapes.export import (csv_response, geojson_response,
+                                         ndjson_response)
+from exchange.storyscapes.utils import (parse_bbox, parse_time_range,
+                                        unicode_csv_dict_reader)
 from geonode.utils import resolve_object
 from geonode.maps.models import Map
 from geonode.utils import json_response
 
-import csv
 import json
 
 
@@ -20,6 +22,13 @@ def _annotations_get(req, mapid):
         ann = ann.filter(in_map=True)
     if bool(req.GET.get('in_timeline', False)):
         ann = ann.filter(in_timeline=True)
+    try:
+        if req.GET.get('bbox'):
+            ann = ann.in_bbox(*parse_bbox(req.GET['bbox']))
+        if req.GET.get('time'):
+            ann = ann.in_time(*parse_time_range(req.GET['time']))
+    except ValueError, e:
+        return HttpResponse(str(e), status=400)
     if 'page' in req.GET:
         page = int(req.GET['page'])
         page_size = 25
@@ -28,42 +37,16 @@ def _annotations_get(req, mapid):
         ann = ann[start:end]
 
     if 'csv' in req.GET:
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename=map-%s-annotations.csv' % mapobj.id
-        response['Content-Encoding'] = 'utf-8'
-        writer = csv.writer(response)
-        writer.writerow(cols)
-        sidx = cols.index('start_time')
-        eidx = cols.index('end_time')
-        # default csv writer chokes on unicode
-        encode = lambda v: v.encode('utf-8') if isinstance(v, basestring) else str(v)
-        get_value = lambda a, c: getattr(a, c) if c not in ('start_time', 'end_time') else ''
-        for a in ann:
-            vals = [encode(get_value(a, c)) for c in cols]
-            vals[sidx] = a.start_time_str
-            vals[eidx] = a.end_time_str
-            writer.writerow(vals)
-        return response
+        return csv_response(ann, cols,
+                            'map-%s-annotations.csv' % mapobj.id)
 
     # strip the superfluous id, it will be added at the feature level
     props = [c for c in cols if c != 'id']
 
-    def encode(query_set):
-        results = []
-        for res in query_set:
-            feature = { 'id' : res.id}
-            if res.the_geom:
-                feature['geometry'] = res.the_geom
+    if 'ndjson' in req.GET:
+        return ndjson_response(ann, props)
 
-            fp = feature['properties'] = {}
-            for p in props:
-                val = getattr(res, p)
-                if val is not None:
-                    fp[p] = val
-            results.append(feature)
-        return results
-
-    return json_response({'type':'FeatureCollection','features':encode(ann)})
+    return geojson_response(ann, props)
 
 
 def _annotations_post(req, mapid):
@@ -73,19 +56,12 @@ def _annotations_post(req, mapid):
     action = 'upsert'
     # default for json to unpack properties for each 'row'
     get_props = lambda r: r['properties']
-    # operation to run on completion
-    finish = lambda: None
-    # track created annotations
-    created = []
     # csv or client to account for differences
     form_mode = 'client'
     content_type = None
     overwrite = False
     error_format = None
 
-    def id_collector(form):
-        created.append(form.instance.id)
-
     if not req.FILES:
         # json body
         data = json.loads(req.body)
@@ -97,13 +73,9 @@ def _annotations_post(req, mapid):
         fp = iter(req.FILES.values()).next()
         # ugh, builtin csv reader chokes on unicode
         data = unicode_csv_dict_reader(fp)
-        id_collector = lambda f: None
         form_mode = 'csv'
         content_type = 'text/html'
         get_props = lambda r: r
-        ids = list(Marker.objects.filter(map=mapobj).values_list('id', flat=True))
-        # delete existing, we overwrite
-        finish = lambda: Marker.objects.filter(id__in=ids).delete()
         overwrite = True
 
         def error_format(row_errors):
@@ -121,16 +93,15 @@ def _annotations_post(req, mapid):
     if action != 'upsert':
         return HttpResponse('%s not supported' % action, status=400)
 
-    errors = _write_annotations(data, get_props, id_collector, mapobj, overwrite, form_mode)
+    errors, created = bulk_write(data, get_props, MarkerForm, Marker, mapobj,
+                                 overwrite, form_mode,
+                                 collect_ids=form_mode == 'client')
 
     if errors:
-        transaction.rollback()
         body = None
         if error_format:
             return HttpResponse(error_format(errors), status=400)
     else:
-        finish()
-        transaction.commit()
         body = {'success': True}
         if created:
             body['ids'] = created
@@ -138,36 +109,13 @@ def _annotations_post(req, mapid):
     return json_response(body=body, errors=errors, content_type=content_type)
 
 
-def _write_annotations(data, get_props, id_collector, mapobj, overwrite, form_mode):
-    i = None
-    errors = []
-    for i, r in enumerate(data):
-        props = get_props(r)
-        props['map'] = mapobj.id
-        ann = None
-        id = r.get('id', None)
-        if id and not overwrite:
-            ann = Marker.objects.get(map=mapobj, pk=id)
-
-        # form expects everything in the props, copy geometry in
-        if 'geometry' in r:
-            props['geometry'] = r['geometry']
-        props.pop('id', None)
-        form = MarkerForm(props, instance=ann, form_mode=form_mode)
-        if not form.is_valid():
-            errors.append((i, form.errors))
-        else:
-            form.save()
-        if id is None:
-            id_collector(form)
-    if i is None:
-        errors = [(0, 'No data could be read')]
-    return errors
-
-
 def annotations(req, mapid):
     '''management of annotations for a given mapid'''
     if req.method == 'GET':
+        if 'progress' in req.GET:
+            resolve_object(req, Map, {'id': mapid},
+                           permission='base.change_resourcebase')
+            return json_response(get_progress(Marker, mapid) or {})
         return _annotations_get(req, mapid)
     if req.method == 'POST':
         return _annotations_post(req, mapid)
@@ -1,16 +1,19 @@
 # -*- coding: utf-8 -*-
-from django.db import transaction
 from django.http import HttpResponse
 from exchange.storyscapes.models.frame import Frame
 from .forms import FrameForm
-from exchange.storyscapes.utils import unicode_csv_dict_reader
+from exchange.storyscapes.bulk import bulk_write, get_progress
+from exchange.storyscapes.export import (csv_response, geojson_response,
+                                         ndjson_response)
+from exchange.storyscapes.utils import (parse_bbox, parse_time_range,
+                                        unicode_csv_dict_reader)
 from geonode.utils import resolve_object
 from geonode.maps.models import Map
 from geonode.utils import json_response
 
 from django.contrib.contenttypes.models import ContentType
 
-import csv
+import ast
 import json
 
 
@@ -36,6 +39,13 @@ def _boxes_get(req, mapid):
         box = box.filter(in_map=True)
     if bool(req.GET.get('in_timeline', False)):
         box = box.filter(in_timeline=True)
+    try:
+        if req.GET.get('bbox'):
+            box = box.in_bbox(*parse_bbox(req.GET['bbox']))
+        if req.GET.get('time'):
+            box = box.in_time(*parse_time_range(req.GET['time']))
+    except ValueError, e:
+        return HttpResponse(str(e), status=400)
     if 'page' in req.GET:
         page = int(req.GET['page'])
         page_size = 25
@@ -44,55 +54,22 @@ def _boxes_get(req, mapid):
         box = box[start:end]
 
     if 'csv' in req.GET:
-        response = HttpResponse(mimetype='text/csv')
-        response['Content-Disposition'] = \
-            'attachment; filename=map-%s-boxes.csv' % mapobj.id
-        response['Content-Encoding'] = 'utf-8'
-        writer = csv.writer(response)
-        writer.writerow(cols)
-        sidx = cols.index('start_time')
-        eidx = cols.index('end_time')
-        # default csv writer chokes on unicode
-        encode = lambda v: (v.encode('utf-8') if isinstance(v,
-                            basestring) else str(v))
-        get_value = lambda a, c: (getattr(a, c) if c
-                                  not in ('start_time', 'end_time'
-                                          ) else '')
-        for a in box:
-            vals = [encode(get_value(a, c)) for c in cols]
-            vals[sidx] = a.start_time_str
-            vals[eidx] = a.end_time_str
-            writer.writerow(vals)
-        return response
+        return csv_response(box, cols, 'map-%s-boxes.csv' % mapobj.id)
 
     # strip the superfluous id, it will be added at the feature level
     props = [c for c in cols if c != 'id']
 
-    def encode(query_set):
-        results = []
-        for res in query_set:
-            feature = {'id': res.id}
-            if res.the_geom:
-                feature['geometry'] = res.the_geom
-
-            fp = feature['properties'] = {}
-            for p in props:
-                val = getattr(res, p)
-                if val is not None:
-                    if isinstance(val, unicode) and '{' in val:
-                        import ast
-                        fp[p] = ast.literal_eval(val)
-                    elif isinstance(val, unicode) and '[' in val:
-                        import ast
-                        fp[p] = ast.literal_eval(val)
-
-                    else:
-                        fp[p] = val
-            results.append(feature)
-        return results
-
-    return json_response({'type': 'FeatureCollection',
-                         'features': encode(box)})
+    if 'ndjson' in req.GET:
+        return ndjson_response(box, props, decode=_decode_value)
+
+    return geojson_response(box, props, decode=_decode_value)
+
+
+def _decode_value(val):
+    # dicts and lists are stored as their python repr
+    if isinstance(val, unicode) and ('{' in val or '[' in val):
+        return ast.literal_eval(val)
+    return val
 
 
 def _boxes_post(req, mapid):
@@ -103,19 +80,12 @@ def _boxes_post(req, mapid):
     action = 'upsert'
     # default for json to unpack properties for each 'row'
     get_props = lambda r: r['properties']
-    # operation to run on completion
-    finish = lambda: None
-    # track created boxes
-    created = []
     # csv or client to account for differences
     form_mode = 'client'
     content_type = None
     overwrite = False
     error_format = None
 
-    def id_collector(form):
-        created.append(form.instance.id)
-
     if not req.FILES:
         # json body
         data = json.loads(req.body)
@@ -127,14 +97,9 @@ def _boxes_post(req, mapid):
         fp = iter(req.FILES.values()).next()
         # ugh, builtin csv reader chokes on unicode
         data = unicode_csv_dict_reader(fp)
-        id_collector = lambda f: None
         form_mode = 'csv'
         content_type = 'text/html'
         get_props = lambda r: r
-        ids = list(Frame.objects.filter(map=mapobj).values_list('id',
-                                                                   flat=True))
-        # delete existing, we overwrite
-        finish = lambda: Frame.objects.filter(id__in=ids).delete()
         overwrite = True
 
         def error_format(row_errors):
@@ -153,23 +118,15 @@ def _boxes_post(req, mapid):
     if action != 'upsert':
         return HttpResponse('%s not supported' % action, status=400)
 
-    errors = _write_boxes(
-        data,
-        get_props,
-        id_collector,
-        mapobj,
-        overwrite,
-        form_mode,
-        )
+    errors, created = bulk_write(data, get_props, FrameForm, Frame, mapobj,
+                                 overwrite, form_mode,
+                                 collect_ids=form_mode == 'client')
 
     if errors:
-        transaction.rollback()
         body = None
         if error_format:
             return HttpResponse(error_format(errors), status=400)
     else:
-        finish()
-        transaction.commit()
         body = {'success': True}
         if created:
             body['ids'] = created
@@ -177,40 +134,13 @@ def _boxes_post(req, mapid):
     return json_response(body=body, errors=errors, content_type=content_type)
 
 
-def _write_boxes(data, get_props, id_collector, mapobj, overwrite, form_mode):
-    i = None
-    errors = []
-    for i, r in enumerate(data):
-        props = get_props(r)
-        props['map'] = mapobj.id
-        #props['object_id'] = mapobj.id
-        #props['content_type'] = ContentType.objects.get(id=mapobj.id).id
-        box = None
-        id = r.get('id', None)
-        if id and not overwrite:
-            box = Frame.objects.get(map=mapobj, pk=id)
-            #box = Frame.objects.get(pk=id)
-
-        # form expects everything in the props, copy geometry in
-        if 'geometry' in r:
-            props['geometry'] = r['geometry']
-        props.pop('id', None)
-        form = FrameForm(props, instance=box, form_mode=form_mode)
-        #form.content_type = ContentType.objects.get_for_model(Map)
-        if not form.is_valid():
-            errors.append((i, form.errors))
-        else:
-            form.save()
-        if id is None:
-            id_collector(form)
-    if i is None:
-        errors = [(0, 'No data could be read')]
-    return errors
-
-
 def boxes(req, mapid):
     '''management of boxes for a given mapid'''
     if req.method == 'GET':
+        if 'progress' in req.GET:
+            resolve_object(req, Map, {'id': mapid},
+                           permission='base.change_resourcebase')
+            return json_response(get_progress(Frame, mapid) or {})
         return _boxes_get(req, mapid)
     if req.method == 'POST':
         return _boxes_post(req, mapid)
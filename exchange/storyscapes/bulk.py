@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from django.core.cache import cache
+from django.db import transaction
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# rows between two progress reports
+PROGRESS_INTERVAL = 1000
+# rows per bulk insert statement
+BATCH_SIZE = 1000
+
+
+def _progress_key(model, mapid):
+    return 'storyscapes_import_progress:%s:%s' % (model._meta.model_name, mapid)
+
+
+def get_progress(model, mapid):
+    '''last reported progress of an import of model rows into a map'''
+    return cache.get(_progress_key(model, mapid))
+
+
+def _report_progress(model, mapobj, phase, rows):
+    logger.debug('%s import into map %s: %s, %s rows',
+                 model._meta.model_name, mapobj.id, phase, rows)
+    cache.set(_progress_key(model, mapobj.id),
+              {'phase': phase, 'rows': rows}, 60 * 60)
+
+
+def validate_rows(data, get_props, form_class, model, mapobj, overwrite,
+                  form_mode):
+    '''
+    Validate every row before anything is written. Existing rows referenced
+    by id are loaded in one query. Returns the (row, errors) pairs of all
+    the invalid rows, plus the new and the updated instances.
+    '''
+    existing = {}
+    if not overwrite:
+        data = list(data)
+        ids = [r['id'] for r in data if str(r.get('id', None)).isdigit()]
+        if ids:
+            existing = dict(
+                (str(pk), instance) for pk, instance in
+                model.objects.filter(map=mapobj).in_bulk(ids).items()
+            )
+
+    errors = []
+    new = []
+    updated = []
+    i = None
+    for i, r in enumerate(data):
+        props = get_props(r)
+        props['map'] = mapobj.id
+        instance = None
+        id = r.get('id', None)
+        if id and not overwrite:
+            instance = existing.get(str(id))
+            if instance is None:
+                errors.append((i, {'id': 'No %s with id %s in this map' % (
+                    model._meta.verbose_name, id)}))
+                continue
+
+        # form expects everything in the props, copy geometry in
+        if 'geometry' in r:
+            props['geometry'] = r['geometry']
+        props.pop('id', None)
+        form = form_class(props, instance=instance, form_mode=form_mode)
+        if not form.is_valid():
+            errors.append((i, form.errors))
+        elif instance is None:
+            new.append(form.save(commit=False))
+        else:
+            updated.append(form.save(commit=False))
+        if (i + 1) % PROGRESS_INTERVAL == 0:
+            _report_progress(model, mapobj, 'validating', i + 1)
+    if i is None:
+        errors = [(0, 'No data could be read')]
+    return errors, new, updated
+
+
+def bulk_write(data, get_props, form_class, model, mapobj, overwrite,
+               form_mode, collect_ids=False):
+    '''
+    Validate all the rows, then write them in a single transaction: on
+    overwrite the rows already in the map are deleted, updated rows are
+    replaced in bulk keeping their ids and new rows are bulk inserted.
+    Nothing is written if any row is invalid.
+
+    Returns the row errors and, with collect_ids, the ids of the new rows.
+    Those are saved one by one, bulk inserts don't return ids on Django 1.8,
+    so collect_ids is only meant for the small edits of the client.
+    '''
+    errors, new, updated = validate_rows(data, get_props, form_class, model,
+                                         mapobj, overwrite, form_mode)
+    if errors:
+        _report_progress(model, mapobj, 'failed', len(new) + len(updated))
+        return errors, []
+
+    # bulk_create skips save, which keeps the geometry bounds in sync
+    for instance in new + updated:
+        instance.update_bounds()
+
+    created = []
+    with transaction.atomic():
+        if overwrite:
+            model.objects.filter(map=mapobj).delete()
+        if updated:
+            model.objects.filter(
+                id__in=[instance.id for instance in updated]
+            ).delete()
+            model.objects.bulk_create(updated, batch_size=BATCH_SIZE)
+        if collect_ids:
+            for instance in new:
+                instance.save()
+                created.append(instance.id)
+        else:
+            for start in xrange(0, len(new), BATCH_SIZE):
+                model.objects.bulk_create(new[start:start + BATCH_SIZE])
+                _report_progress(model, mapobj, 'writing',
+                                 min(start + BATCH_SIZE, len(new)))
+    _report_progress(model, mapobj, 'done', len(new) + len(updated))
+    return errors, created
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from django.http import StreamingHttpResponse
+from exchange.core.streaming import csv_value, csv_writer
+from exchange.storyscapes.models.mixins import SpatioTemporalMixin
+
+import json
+
+# rows read per query while streaming
+CHUNK_SIZE = 1000
+
+TIME_COLUMNS = ('start_time', 'end_time')
+
+
+def iter_chunks(queryset, fields):
+    '''
+    Rows of the queryset as dicts of the given fields, in queryset order,
+    CHUNK_SIZE rows at a time. Only the ordered ids are held in memory, the
+    rows themselves are read with values() one chunk per query.
+    '''
+    ids = list(queryset.values_list('id', flat=True).iterator())
+    model = queryset.model
+    for start in xrange(0, len(ids), CHUNK_SIZE):
+        chunk = ids[start:start + CHUNK_SIZE]
+        rows = dict(
+            (row['id'], row) for row in
+            model.objects.filter(id__in=chunk).values('id', *fields).iterator()
+        )
+        # rows deleted since the ids were read are skipped
+        yield [rows[pk] for pk in chunk if pk in rows]
+
+
+def _timefmt(val):
+    return SpatioTemporalMixin._timefmt(val) if val else ''
+
+
+def csv_response(queryset, cols, filename):
+    '''stream the queryset as csv, one row per object'''
+    def lines():
+        writer = csv_writer()
+        yield writer.writerow(cols)
+        for rows in iter_chunks(queryset, cols):
+            out = []
+            for row in rows:
+                out.append(writer.writerow([
+                    _timefmt(row[c]) if c in TIME_COLUMNS
+                    else csv_value(row[c]) for c in cols
+                ]))
+            yield ''.join(out)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename=%s' % filename
+    response['Content-Encoding'] = 'utf-8'
+    return response
+
+
+def _feature(row, props, decode):
+    feature = {'id': row['id']}
+    if row['the_geom']:
+        feature['geometry'] = row['the_geom']
+
+    fp = feature['properties'] = {}
+    for p in props:
+        val = row[p]
+        if val is not None:
+            fp[p] = decode(val) if decode else val
+    return feature
+
+
+def _iter_features(queryset, props, decode):
+    for rows in iter_chunks(queryset, ['the_geom'] + props):
+        yield [json.dumps(_feature(row, props, decode)) for row in rows]
+
+
+def geojson_response(queryset, props, decode=None):
+    '''stream the queryset as a geojson FeatureCollection'''
+    def chunks():
+        yield '{"type": "FeatureCollection", "features": ['
+        sep = ''
+        for features in _iter_features(queryset, props, decode):
+            if features:
+                yield sep + ', '.join(features)
+                sep = ', '
+        yield ']}'
+
+    return StreamingHttpResponse(chunks(), content_type='application/json')
+
+
+def ndjson_response(queryset, props, decode=None):
+    '''stream the queryset as newline delimited geojson features'''
+    def chunks():
+        for features in _iter_features(queryset, props, decode):
+            if features:
+                yield '\n'.join(features) + '\n'
+
+    return StreamingHttpResponse(chunks(),
+                                 content_type='application/x-ndjson')
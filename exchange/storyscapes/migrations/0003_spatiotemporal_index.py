@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from exchange.storyscapes.utils import geojson_bounds
+
+
+def populate_bounds(apps, schema_editor):
+    for name in ('Frame', 'Marker'):
+        model = apps.get_model('storyscapes', name)
+        rows = model.objects.exclude(the_geom__isnull=True).exclude(the_geom='')
+        for pk, geom in rows.values_list('id', 'the_geom').iterator():
+            bounds = geojson_bounds(geom)
+            if bounds:
+                model.objects.filter(id=pk).update(
+                    bbox_x0=bounds[0], bbox_y0=bounds[1],
+                    bbox_x1=bounds[2], bbox_y1=bounds[3])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storyscapes', '0002_frame_marker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='frame',
+            name='bbox_x0',
+            field=models.FloatField(null=True, editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='frame',
+            name='bbox_y0',
+            field=models.FloatField(null=True, editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='frame',
+            name='bbox_x1',
+            field=models.FloatField(null=True, editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='frame',
+            name='bbox_y1',
+            field=models.FloatField(null=True, editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='marker',
+            name='bbox_x0',
+            field=models.FloatField(null=True, editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='marker',
+            name='bbox_y0',
+            field=models.FloatField(null=True, editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='marker',
+            name='bbox_x1',
+            field=models.FloatField(null=True, editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='marker',
+            name='bbox_y1',
+            field=models.FloatField(null=True, editable=False, blank=True),
+        ),
+        migrations.AlterIndexTogether(
+            name='frame',
+            index_together=set([('map', 'start_time', 'end_time')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='marker',
+            index_together=set([('map', 'start_time', 'end_time')]),
+        ),
+        migrations.RunPython(populate_bounds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storyscapes', '0003_spatiotemporal_index'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='frame',
+            index_together=set([
+                ('map', 'start_time', 'end_time'),
+                ('map', 'bbox_x0', 'bbox_x1', 'bbox_y0', 'bbox_y1'),
+            ]),
+        ),
+        migrations.AlterIndexTogether(
+            name='marker',
+            index_together=set([
+                ('map', 'start_time', 'end_time'),
+                ('map', 'bbox_x0', 'bbox_x1', 'bbox_y0', 'bbox_y1'),
+            ]),
+        ),
+    ]
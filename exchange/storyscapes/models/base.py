@@ -1,11 +1,52 @@
 from geonode.base.models import ResourceBase, TopicCategory
-from geonode.maps.models import Map
+from geonode.layers.models import Layer
+from geonode.maps.models import Map, MapLayer
+from guardian.models import GroupObjectPermission, UserObjectPermission
 import json
+import time
 import uuid
 
 from django import core, db
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 
+# seconds a built story viewer config is served from the cache
+STORY_CONFIG_CACHE_TIMEOUT = getattr(settings, 'STORY_CONFIG_CACHE_TIMEOUT',
+                                     300)
+
+
+def _config_version_key(story_id):
+    return 'story_config_version:%s' % story_id
+
+
+def get_config_version(story_id):
+    '''
+    Current version of a story's viewer config, bumped by
+    invalidate_story_config whenever the story, its chapters, their maps
+    and map layers, or the permissions on them change.
+    '''
+    key = _config_version_key(story_id)
+    version = cache.get(key)
+    if version is None:
+        # never restart from an old version if the key was evicted
+        version = int(time.time() * 1000)
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def invalidate_story_config(*story_ids):
+    for story_id in story_ids:
+        try:
+            cache.incr(_config_version_key(story_id))
+        except ValueError:
+            get_config_version(story_id)
+
 
 class Story(ResourceBase):
 
@@ -39,6 +80,24 @@ class Story(ResourceBase):
         self.save()
 
     def viewer_json(self, user):
+        '''
+        The viewer config of the story, cached per story version and user
+        since building it asks every chapter map for its own config.
+        '''
+        if user is not None and user.is_authenticated():
+            scope = user.pk
+        else:
+            scope = 'anonymous'
+        key = 'story_config:%s:%s:%s' % (self.id,
+                                         get_config_version(self.id),
+                                         scope)
+        config = cache.get(key)
+        if config is None:
+            config = self.build_viewer_json(user)
+            cache.set(key, config, STORY_CONFIG_CACHE_TIMEOUT)
+        return config
+
+    def build_viewer_json(self, user):
 
         about = {
             'title': self.title,
@@ -50,12 +109,27 @@ class Story(ResourceBase):
         config = {
             'id': self.id,
             'about': about,
-            'chapters': [chapter.map.viewer_json(user, None) for chapter in self.chapters.all()],
+            'chapters': [chapter.viewer_json(user, None) for chapter in
+                         self.chapters.select_related('owner')],
             'thumbnail_url': '/static/geonode/img/missing_thumb.png'
         }
 
         return config
 
+    @property
+    def local_layers(self):
+        '''
+        The local layers of all chapter maps, in a single query rather
+        than one per chapter.
+        '''
+        layer_names = MapLayer.objects.filter(
+            map__storychapter__story=self
+        ).values('name')
+        return Layer.objects.filter(
+            db.models.Q(typename__in=layer_names) |
+            db.models.Q(name__in=layer_names)
+        )
+
     def update_thumbnail(self, first_chapter_obj):
         if first_chapter_obj.chapter_index != 0:
             return
@@ -125,3 +199,52 @@ class StoryChapter(db.models.Model):
         db_table = 'maps_story_bridge'
         pass
 
+
+@receiver(post_save, sender=Story)
+@receiver(post_delete, sender=Story)
+def story_config_story_changed(sender, instance, **kwargs):
+    invalidate_story_config(instance.pk)
+
+
+@receiver(post_save, sender=StoryChapter)
+@receiver(post_delete, sender=StoryChapter)
+def story_config_chapter_changed(sender, instance, **kwargs):
+    if instance.story_id is not None:
+        invalidate_story_config(instance.story_id)
+
+
+@receiver(post_save, sender=Map)
+@receiver(post_delete, sender=Map)
+def story_config_map_changed(sender, instance, **kwargs):
+    invalidate_story_config(*StoryChapter.objects.filter(
+        map_id=instance.pk
+    ).values_list('story_id', flat=True))
+
+
+@receiver(post_save, sender=MapLayer)
+@receiver(post_delete, sender=MapLayer)
+def story_config_map_layer_changed(sender, instance, **kwargs):
+    invalidate_story_config(*StoryChapter.objects.filter(
+        map_id=instance.map_id
+    ).values_list('story_id', flat=True))
+
+
+@receiver(post_save, sender=UserObjectPermission)
+@receiver(post_delete, sender=UserObjectPermission)
+@receiver(post_save, sender=GroupObjectPermission)
+@receiver(post_delete, sender=GroupObjectPermission)
+def story_config_permission_changed(sender, instance, **kwargs):
+    # the configs are built per user, for the story and its chapter maps.
+    # this runs for every object permission of the site, the content types
+    # come from the ContentType cache and the stories from one query
+    if instance.content_type_id not in [
+            ContentType.objects.get_for_model(model).id
+            for model in (ResourceBase, Map, Story)]:
+        return
+    try:
+        pk = int(instance.object_pk)
+    except (TypeError, ValueError):
+        return
+    invalidate_story_config(*Story.objects.filter(
+        Q(pk=pk) | Q(storychapter__map=pk)
+    ).values_list('pk', flat=True).distinct())
@@ -5,30 +5,20 @@ from django.contrib.contenttypes import fields
 
 from geonode.maps.models import Map
 
-from .mixins import SpatioTemporalMixin
+from .mixins import SpatioTemporalManager, SpatioTemporalMixin
 
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class FrameManager(models.Manager):
+class FrameManager(SpatioTemporalManager):
 
     def copy_frames(self, source_id, target):
-        source = self.objects.get(id=source_id)
-        copies = []
-
-        logger.debug('copy from', source_id, source.Frame_set.all())
-        logger.debug('to target', target.id)
-
-        for frame in source.Frame_set.all():
-            frame.map = target
-            frame.pk = None
-            copies.append(frame)
-
-        logger.debug(copies)
-
-        Frame.objects.bulk_create(copies)
+        count = self.copy_map(source_id, target.id)
+        logger.debug('copied %s frames from map %s to %s',
+                     count, source_id, target.id)
+        return count
 
 
 class Frame(SpatioTemporalMixin):
@@ -76,4 +66,6 @@ class Frame(SpatioTemporalMixin):
         return self.title
 
     class Meta:
-        verbose_name_plural = "Frame"
\ No newline at end of file
+        verbose_name_plural = "Frame"
+        index_together = (('map', 'start_time', 'end_time'),
+                          ('map', 'bbox_x0', 'bbox_x1', 'bbox_y0', 'bbox_y1'))
@@ -1,26 +1,20 @@
 from django.db import models
 from geonode.maps.models import Map
 
-from .mixins import SpatioTemporalMixin
+from .mixins import SpatioTemporalManager, SpatioTemporalMixin
 
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class MarkerManager(models.Manager):
+class MarkerManager(SpatioTemporalManager):
 
     def copy_map_Markers(self, source_id, target):
-        source = Map.objects.get(id=source_id)
-        copies = []
-        logger.debug('copy from', source_id, source.Marker_set.all())
-        logger.debug('to target', target.id)
-        for marker in source.Marker_set.all():
-            marker.map = target
-            marker.pk = None
-            copies.append(marker)
-        logger.debug(copies)
-        Marker.objects.bulk_create(copies)
+        count = self.copy_map(source_id, target.id)
+        logger.debug('copied %s markers from map %s to %s',
+                     count, source_id, target.id)
+        return count
 
 
 class Marker(SpatioTemporalMixin):
@@ -39,4 +33,8 @@ class Marker(SpatioTemporalMixin):
     pause_playback = models.BooleanField(default=False)
 
     def __unicode__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+    class Meta:
+        index_together = (('map', 'start_time', 'end_time'),
+                          ('map', 'bbox_x0', 'bbox_x1', 'bbox_y0', 'bbox_y1'))
@@ -1,10 +1,63 @@
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import Q
 
-from exchange.storyscapes.utils import parse_date_time
+from exchange.storyscapes.utils import geojson_bounds, parse_date_time
 
 from datetime import datetime
 
 
+class SpatioTemporalQuerySet(models.QuerySet):
+
+    def in_bbox(self, minx, miny, maxx, maxy):
+        '''
+        objects whose geometry bounds intersect the bbox. objects without a
+        geometry have no place on the map and are kept.
+        '''
+        return self.filter(
+            Q(bbox_x0__isnull=True) |
+            Q(bbox_x0__lte=maxx, bbox_x1__gte=minx,
+              bbox_y0__lte=maxy, bbox_y1__gte=miny)
+        )
+
+    def in_time(self, start, end):
+        '''
+        objects visible at some point between start and end. an object
+        without an end time is an instant, one without a start time is
+        always visible.
+        '''
+        return self.filter(
+            Q(start_time__isnull=True) |
+            Q(start_time__lte=end, end_time__gte=start) |
+            Q(start_time__lte=end, start_time__gte=start,
+              end_time__isnull=True)
+        )
+
+
+class SpatioTemporalManager(
+        models.Manager.from_queryset(SpatioTemporalQuerySet)):
+
+    def copy_map(self, source_id, target_id):
+        '''
+        copy all the rows of one map to another in a single INSERT ... SELECT,
+        without loading them. returns the number of rows copied.
+        '''
+        opts = self.model._meta
+        qn = connections[self.db].ops.quote_name
+        map_column = opts.get_field('map').column
+        columns = [f.column for f in opts.concrete_fields if not f.primary_key]
+        select = ['%s' if c == map_column else qn(c) for c in columns]
+        sql = 'INSERT INTO %s (%s) SELECT %s FROM %s WHERE %s = %%s' % (
+            qn(opts.db_table), ', '.join(qn(c) for c in columns),
+            ', '.join(select), qn(opts.db_table), qn(map_column))
+        with transaction.atomic(using=self.db):
+            cursor = connections[self.db].cursor()
+            try:
+                cursor.execute(sql, [target_id, source_id])
+                return cursor.rowcount
+            finally:
+                cursor.close()
+
+
 class SpatioTemporalMixin(models.Model):
 
     the_geom = models.TextField(blank=True, null=True)
@@ -12,6 +65,12 @@ class SpatioTemporalMixin(models.Model):
     start_time = models.BigIntegerField(blank=True, null=True)
     end_time = models.BigIntegerField(blank=True, null=True)
 
+    # bounds of the_geom, kept in sync on save for bbox queries
+    bbox_x0 = models.FloatField(blank=True, null=True, editable=False)
+    bbox_y0 = models.FloatField(blank=True, null=True, editable=False)
+    bbox_x1 = models.FloatField(blank=True, null=True, editable=False)
+    bbox_y1 = models.FloatField(blank=True, null=True, editable=False)
+
     @staticmethod
     def _timefmt(val):
         return datetime.isoformat(datetime.utcfromtimestamp(val))
@@ -22,6 +81,15 @@ class SpatioTemporalMixin(models.Model):
     def set_end(self, val):
         self.end_time = parse_date_time(val)
 
+    def update_bounds(self):
+        '''set the bbox fields from the_geom, needed before bulk_create'''
+        bounds = geojson_bounds(self.the_geom) or (None, None, None, None)
+        self.bbox_x0, self.bbox_y0, self.bbox_x1, self.bbox_y1 = bounds
+
+    def save(self, *args, **kwargs):
+        self.update_bounds()
+        super(SpatioTemporalMixin, self).save(*args, **kwargs)
+
     @property
     def start_time_str(self):
         return self._timefmt(self.start_time) if self.start_time else ''
@@ -31,4 +99,4 @@ class SpatioTemporalMixin(models.Model):
         return self._timefmt(self.end_time) if self.end_time else ''
 
     class Meta:
-        abstract = True
\ No newline at end of file
+        abstract = True
@@ -1,9 +1,11 @@
+from collections import OrderedDict
+
 from agon_ratings.models import OverallRating
 from dialogos.models import Comment
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Avg
 from haystack import indexes
-from .models.base import Story
+from .models.base import Story, StoryChapter
 
 
 class StoryIndex(indexes.SearchIndex, indexes.Indexable):
@@ -72,10 +74,52 @@ class StoryIndex(indexes.SearchIndex, indexes.Indexable):
     def get_model(self):
         return Story
 
+    def index_queryset(self, using=None):
+        """
+        Stories for update_index, with owner, category, keywords and regions
+        loaded per chunk and the rating and count fields computed by
+        subqueries in the chunk query itself instead of per story.
+        """
+        ct = ContentType.objects.get_for_model(Story)
+        story_pk = '%s.%s' % (Story._meta.db_table, Story._meta.pk.column)
+        select = OrderedDict([
+            ('index_rating',
+             'SELECT AVG(rating) FROM %s WHERE object_id = %s '
+             'AND content_type_id = %%s' % (
+                 OverallRating._meta.db_table, story_pk)),
+            ('index_num_ratings',
+             'SELECT COUNT(*) FROM %s WHERE object_id = %s '
+             'AND content_type_id = %%s' % (
+                 OverallRating._meta.db_table, story_pk)),
+            ('index_num_comments',
+             'SELECT COUNT(*) FROM %s WHERE object_id = %s '
+             'AND content_type_id = %%s' % (
+                 Comment._meta.db_table, story_pk)),
+            ('index_num_chapters',
+             'SELECT COUNT(*) FROM %s WHERE story_id = %s '
+             'AND map_id IS NOT NULL' % (
+                 StoryChapter._meta.db_table, story_pk)),
+        ])
+        return self.get_model().objects.select_related(
+            'owner',
+            'category'
+        ).prefetch_related(
+            'keywords',
+            'regions'
+        ).extra(
+            select=select,
+            select_params=(ct.id, ct.id, ct.id)
+        )
+
     def prepare_type(self, obj):
         return "story"
 
+    # The prepare methods below fall back to per story queries for objects
+    # that don't come from index_queryset, e.g. realtime single updates.
+
     def prepare_rating(self, obj):
+        if hasattr(obj, 'index_rating'):
+            return float(str(obj.index_rating or "0"))
         ct = ContentType.objects.get_for_model(obj)
         try:
             rating = OverallRating.objects.filter(
@@ -87,12 +131,16 @@ class StoryIndex(indexes.SearchIndex, indexes.Indexable):
             return 0.0
 
     def prepare_num_chapters(self, obj):
+        if hasattr(obj, 'index_num_chapters'):
+            return obj.index_num_chapters
         try:
             return obj.chapters.all().count()
         except:
             return 0
 
     def prepare_num_ratings(self, obj):
+        if hasattr(obj, 'index_num_ratings'):
+            return obj.index_num_ratings
         ct = ContentType.objects.get_for_model(obj)
         try:
             return OverallRating.objects.filter(
@@ -103,6 +151,8 @@ class StoryIndex(indexes.SearchIndex, indexes.Indexable):
             return 0
 
     def prepare_num_comments(self, obj):
+        if hasattr(obj, 'index_num_comments'):
+            return obj.index_num_comments
         try:
             return Comment.objects.filter(
                 object_id=obj.pk,
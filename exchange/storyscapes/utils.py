@@ -2,25 +2,25 @@ import codecs
 from cStringIO import StringIO
 import csv
 import datetime
+import itertools
+import json
+import re
 
 
-dateparts = '%Y', '%m', '%d'
-timeparts = '%H', '%M', '%S'
-_patterns = []
-for i in xrange(len(dateparts)):
-    _patterns.append('/'.join(dateparts[0:i + 1]))
-    _patterns.append('-'.join(dateparts[0:i + 1]))
-for i in xrange(len(timeparts)):
-    time = ':'.join(timeparts[0:i + 1])
-    _patterns.append('/'.join(dateparts) + 'T' + time)
-    _patterns.append('-'.join(dateparts) + 'T' + time)
-    _patterns.append('/'.join(dateparts) + ' ' + time)
-    _patterns.append('-'.join(dateparts) + ' ' + time)
-del dateparts, timeparts
+# the accepted formats are yyyy[-mm[-dd]] or yyyy[/mm[/dd]], a full date
+# optionally followed by a 'T' or whitespace and hh[:mm[:ss]]. the groups
+# accept what strptime accepts for the matching directive so one regex
+# dispatches to the only format that can apply, without trying each one.
+_date_time_re = re.compile(
+    r'(?P<Y>\d\d\d\d)'
+    r'(?:(?P<sep>[/-])(?P<m>1[0-2]|0[1-9]|[1-9])'
+    r'(?:(?P=sep)(?P<d>3[01]|[12]\d|0[1-9]|[1-9]| [1-9])'
+    r'(?:(?:T|\s+)(?P<H>2[0-3]|[0-1]\d|\d)'
+    r'(?::(?P<M>[0-5]\d|\d)'
+    r'(?::(?P<S>6[0-1]|[0-5]\d|\d))?)?)?)?)?\Z',
+    re.IGNORECASE)
 _epoch = datetime.datetime.utcfromtimestamp(0)
 
-_patterns = set(_patterns)
-
 
 def datetime_to_seconds(dt):
     delta = dt - _epoch
@@ -38,38 +38,160 @@ def parse_date_time(val):
     idx = val.find('.')
     if idx > 0:
         val = val[:idx]
-    for p in _patterns:
-        try:
-            return datetime.datetime.strptime(val, p)
-        except ValueError:
-            pass
+    match = _date_time_re.match(val)
+    if match is None:
+        return None
+    parts = [int(p) if p else 1 for p in match.group('Y', 'm', 'd')]
+    parts += [int(p) if p else 0 for p in match.group('H', 'M', 'S')]
+    try:
+        return datetime.datetime(*parts)
+    except ValueError:
+        # out of range, e.g. february 30th or year 0
+        return None
 
 
-def unicode_csv_dict_reader(fp):
-    if isinstance(fp, basestring):
-        fp = StringIO(fp)
+# bytes read from an upload at a time
+CSV_CHUNK_SIZE = 64 * 1024
 
-    # guess encoding, yay
-    encodings = ('utf-8', 'cp1252')
-    for enc in encodings:
-        fp.seek(0)
-        reader = codecs.getreader(enc)(fp)
-        try:
-            for line in reader:
-                line.encode('utf-8')
+
+def _iter_lines(fp, chunk_size=CSV_CHUNK_SIZE):
+    buf = ''
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
             break
-        except UnicodeDecodeError:
-            pass
-    if not enc:
-        raise UnicodeError('unable to decode CSV, invalid characters present')
+        lines = (buf + chunk).splitlines(True)
+        # the last line may continue in the next chunk
+        buf = lines.pop()
+        for line in lines:
+            yield line
+    if buf:
+        yield buf
+
+
+def _iter_utf8_lines(fp):
+    '''
+    lines of fp as utf-8 bytes. a utf-8 BOM is dropped, otherwise the
+    content is read as utf-8 until a line fails to decode, that line and
+    the rest are then read as cp1252.
+    '''
+    lines = _iter_lines(fp)
+    first = next(lines, None)
+    if first is None:
+        return
+    if first.startswith(codecs.BOM_UTF8):
+        first = first[len(codecs.BOM_UTF8):]
+    enc = 'utf-8'
+    for line in itertools.chain([first], lines):
+        if enc == 'utf-8':
+            try:
+                line.decode('utf-8')
+                yield line
+                continue
+            except UnicodeDecodeError:
+                enc = 'cp1252'
+        yield line.decode(enc, 'ignore').encode('utf-8')
+
 
+def unicode_csv_dict_reader(fp):
+    '''
+    rows of a csv file or string as dicts of unicode values, empty values
+    left out. the file is read lazily, in a single pass.
+    '''
+    if isinstance(fp, unicode):
+        fp = fp.encode('utf-8')
+    if isinstance(fp, basestring):
+        fp = StringIO(fp)
     fp.seek(0)
-    lines = (line.encode('utf-8')
-             for line in codecs.getreader(enc)(fp, errors='ignore'))
-    reader = csv.DictReader(lines)
+
+    # builtin csv reader chokes on unicode, feed it utf-8 bytes
+    reader = csv.DictReader(_iter_utf8_lines(fp))
     return (dict([(k, unicode(v, 'utf-8'))
                   for k, v in row.items() if v]) for row in reader)
 
 
 def make_point(x, y):
-    return '{"type" : "Point", "coordinates" : [ %s, %s ]}' % (x, y)
\ No newline at end of file
+    return '{"type" : "Point", "coordinates" : [ %s, %s ]}' % (x, y)
+
+def _iter_positions(coords):
+    if coords and isinstance(coords[0], (int, long, float)):
+        yield coords
+        return
+    for c in coords:
+        for pos in _iter_positions(c):
+            yield pos
+
+
+def geojson_bounds(geom):
+    '''(minx, miny, maxx, maxy) of a GeoJSON geometry string, None if empty'''
+    if not geom:
+        return None
+    try:
+        geom = json.loads(geom)
+    except ValueError:
+        return None
+    if not isinstance(geom, dict):
+        return None
+    geometries = geom.get('geometries', [geom])
+    xs, ys = [], []
+    for g in geometries:
+        try:
+            for pos in _iter_positions(g.get('coordinates') or []):
+                xs.append(float(pos[0]))
+                ys.append(float(pos[1]))
+        except (TypeError, ValueError, IndexError):
+            return None
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def parse_bbox(val):
+    '''parse a minx,miny,maxx,maxy bbox query parameter'''
+    parts = val.split(',')
+    if len(parts) != 4:
+        raise ValueError('bbox should be minx,miny,maxx,maxy')
+    try:
+        bbox = [float(p) for p in parts]
+    except ValueError:
+        raise ValueError('Invalid bbox : %s' % val)
+    if bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise ValueError('Invalid bbox : %s' % val)
+    return bbox
+
+
+def _parse_instant(val):
+    if not val:
+        raise ValueError('time should be start/end or a single time')
+    if val.isdigit():
+        return int(val)
+    parsed = parse_date_time(val)
+    if parsed is None:
+        raise ValueError('Unable to read as date : %s' % val)
+    return int(datetime_to_seconds(parsed))
+
+
+def parse_time_range(val):
+    '''
+    parse a start/end time query parameter, either side in seconds or as a
+    formatted date. a single value is an instant. dates may hold slashes
+    themselves (2000/01/02), so the value is only split on a slash when it
+    is not a time as a whole and both sides read as times.
+    '''
+    try:
+        start = end = _parse_instant(val)
+    except ValueError:
+        start = end = None
+        idx = val.find('/')
+        while idx >= 0 and start is None:
+            try:
+                start = _parse_instant(val[:idx])
+                end = _parse_instant(val[idx + 1:])
+            except ValueError:
+                start = end = None
+            idx = val.find('/', idx + 1)
+        if start is None:
+            raise ValueError('time should be start/end or a single time')
+    if start > end:
+        raise ValueError('Invalid time range : %s' % val)
+    return start, end
@@ -6,13 +6,18 @@ from geonode.maps.models import Map, MapSnapshot
 from geonode.maps.views import clean_config
 
 from .models.base import StoryChapter
+from .models.frame import Frame
+from .models.marker import Marker
 
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.shortcuts import render_to_response
 from django.template import RequestContext
 
 from geonode.utils import resolve_object
 
+from exchange.core.counters import record_view
+
 from geonode.layers.views import _PERMISSION_MSG_GENERIC, _PERMISSION_MSG_VIEW, _PERMISSION_MSG_DELETE
 
 _PERMISSION_MSG_LOGIN = 'You must be logged in to save this story'
@@ -62,50 +67,81 @@ def new_chapter_json(request):
                 status=401
             )
 
-        map_obj = Map(owner=request.user, zoom=0,
-                      center_x=0, center_y=0)
-        map_obj.is_published = False
-        map_obj.save()
-        map_obj.set_default_permissions()
-
         # If the body has been read already, use an empty string.
         # See https://github.com/django/django/commit/58d555caf527d6f1bdfeab14527484e4cca68648
         # for a better exception to catch when we move to Django 1.7.
+        copy_from = None
+        chapter = None
         try:
             body = request.body
 
             if isinstance(body, basestring):
                 body = json.loads(body)
+                # duplicating a chapter, the map to copy the story content of
+                copy_from = body.get('copy_from', None)
                 story_id = body.get('story_id', 0)
-                story_obj = Story.objects.get(id=story_id)
-                mapping = StoryChapter()
-                mapping.chapter_index = body['chapter_index']
-                mapping.map = map_obj
-                mapping.story = story_obj
-                mapping.save()
+                chapter = (Story.objects.get(id=story_id),
+                           body['chapter_index'])
 
         except Exception as e:
             print e
             body = ''
 
-        try:
-            map_obj.update_from_viewer(body)
-            MapSnapshot.objects.create(
-                config=clean_config(body),
-                map=map_obj,
-                user=request.user)
-        except ValueError as e:
-            return HttpResponse(str(e), status=400)
-        else:
-            return HttpResponse(
-                json.dumps({'id': map_obj.id}),
-                status=200,
-                content_type='application/json'
-            )
+        # checked before anything is saved, to leave no orphan chapter
+        source = None
+        if copy_from:
+            if str(copy_from).isdigit():
+                source = Map.objects.filter(id=copy_from).first()
+            if source is None or not request.user.has_perm(
+                    'view_resourcebase', source.get_self_resource()):
+                return HttpResponse(
+                    _PERMISSION_MSG_VIEW,
+                    content_type="text/plain",
+                    status=403
+                )
+
+        with transaction.atomic():
+            map_obj = Map(owner=request.user, zoom=0,
+                          center_x=0, center_y=0)
+            map_obj.is_published = False
+            map_obj.save()
+            map_obj.set_default_permissions()
+
+            if chapter is not None:
+                mapping = StoryChapter()
+                mapping.chapter_index = chapter[1]
+                mapping.map = map_obj
+                mapping.story = chapter[0]
+                mapping.save()
+
+            try:
+                map_obj.update_from_viewer(body)
+                MapSnapshot.objects.create(
+                    config=clean_config(body),
+                    map=map_obj,
+                    user=request.user)
+            except ValueError as e:
+                transaction.set_rollback(True)
+                return HttpResponse(str(e), status=400)
+
+            if source is not None:
+                _copy_chapter_content(source.id, map_obj)
+
+        return HttpResponse(
+            json.dumps({'id': map_obj.id}),
+            status=200,
+            content_type='application/json'
+        )
     else:
         return HttpResponse(status=405)
 
 
+def _copy_chapter_content(source_id, target):
+    '''copy the annotations and boxes of a chapter map, in the database'''
+    Marker.objects.copy_map_Markers(source_id, target)
+    Frame.objects.copy_frames(source_id, target)
+
+
 def draft_view(request, story_id, template='composer/editor.html'):
 
     story_obj = _resolve_story(request, story_id, 'base.change_resourcebase', _PERMISSION_MSG_SAVE)
@@ -190,15 +226,12 @@ def story_detail(request, story_id, snapshot=None, template='viewer/story_detail
     # Update count for popularity ranking,
     # but do not includes admins or resource owners
     if request.user != story_obj.owner and not request.user.is_superuser:
-        Story.objects.filter(id=story_obj.id).update(popular_count=F('popular_count') + 1)
+        record_view(story_obj)
 
     config = story_obj.viewer_json(request.user)
 
     config = json.dumps(config)
-    chapters = story_obj.chapters.all()
-    layers = []
-    for chapter in chapters:
-        layers = layers + list(chapter.local_layers)
+    layers = list(story_obj.local_layers)
 
     keywords = json.dumps([tag.name for tag in story_obj.keywords.all()])
 
@@ -1,5 +1,6 @@
 from celery.task import task
 from celery.utils.log import get_task_logger
+from exchange.core.metrics import csw_transaction
 from exchange.core.models import CSWRecord
 from geonode.catalogue import get_catalogue
 from xml.sax.saxutils import escape
@@ -112,7 +113,8 @@ def create_record(self, id):
                 'keywords': record.keywords,
                 'title_alternate': record.typename
             })
-            resp = catalogue.create_record(item)
+            with csw_transaction.time(operation='create'):
+                resp = catalogue.create_record(item)
             logger.debug(resp)
     else:
         item = Record({
@@ -140,7 +142,8 @@ def create_record(self, id):
                 #'keywords': service.keywords,
                 'title_alternate': service.servicelayer_set.all()[0].typename
             })
-        resp = catalogue.create_record(item)
+        with csw_transaction.time(operation='create'):
+            resp = catalogue.create_record(item)
         logger.debug(resp)
 
 
@@ -157,4 +160,5 @@ def delete_record(self, id):
     """
 
     catalogue = get_catalogue()
-    catalogue.remove_record(id)
\ No newline at end of file
+    with csw_transaction.time(operation='delete'):
+        catalogue.remove_record(id)
\ No newline at end of file
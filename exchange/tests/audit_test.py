@@ -1,6 +1,22 @@
 # Perform tests for auditing.
+import glob
+import gzip
+import json
+import os
+import tempfile
+from shutil import rmtree
+from StringIO import StringIO
+
+from django.core.management import call_command
+
 from . import ExchangeTest
+from exchange.audit.logfile import RotatingAuditLog
 from exchange.audit.models import AuditEvent
+from exchange.audit.query import get_events
+from exchange.audit.registry import registry
+from exchange.themes.models import Theme
+from geonode.layers.models import Layer
+from geonode.maps.models import Map
 
 
 class AuditTest(ExchangeTest):
@@ -34,3 +50,136 @@ class AuditAdminTest(ExchangeTest):
                          'Did not get admin audit event list (status: %d)' % (
                            r.status_code
                          ))
+
+    def test_model_admin_search(self):
+        AuditEvent.objects.create(event='login', username='searched',
+                                  ip='10.0.0.1')
+        for term in ('searched', 'nobody@example.com', '10.0.0.1'):
+            r = self.client.get('/admin/audit/auditevent/', {'q': term})
+            self.assertEqual(r.status_code, 200)
+        self.assertContains(
+            self.client.get('/admin/audit/auditevent/', {'q': '10.0.0.1'}),
+            'searched'
+        )
+
+    def test_events_api(self):
+        r = self.client.get('/audit/events/', {'event': 'login', 'limit': 1})
+        self.assertEqual(r.status_code, 200)
+        data = json.loads(r.content)
+        self.assertEqual(len(data['events']), 1)
+        self.assertEqual(data['events'][0]['event'], 'login')
+
+        r = self.client.get('/audit/events/', {'cursor': 'bogus'})
+        self.assertEqual(r.status_code, 400)
+
+    def test_export_api(self):
+        last_id = AuditEvent.objects.latest('id').id
+        AuditEvent.objects.create(event='failed_login', username='exported')
+        r = self.client.get('/audit/export/', {'after_id': last_id})
+        self.assertEqual(r.status_code, 200)
+        lines = ''.join(r.streaming_content).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['username'], 'exported')
+
+        r = self.client.get('/audit/export/', {'format': 'csv'})
+        self.assertEqual(r.status_code, 200)
+        header = ''.join(r.streaming_content).splitlines()[0]
+        self.assertTrue(header.startswith('id,event,username'))
+
+        r = self.client.get('/audit/export/', {'format': 'xml'})
+        self.assertEqual(r.status_code, 400)
+
+
+class AuditQueryTest(ExchangeTest):
+
+    def test_cursor_pagination(self):
+        for i in range(5):
+            AuditEvent.objects.create(event='failed_login',
+                                      username='paged%d' % i)
+        seen = []
+        events, cursor = get_events({'event': 'failed_login'}, limit=2)
+        seen.extend(events)
+        while cursor:
+            events, cursor = get_events({'event': 'failed_login'},
+                                        cursor=cursor, limit=2)
+            seen.extend(events)
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(event.id for event in seen)), 5)
+        self.assertEqual(
+            [event.id for event in seen],
+            list(AuditEvent.objects.filter(event='failed_login')
+                 .order_by('-datetime', '-id').values_list('id', flat=True))
+        )
+
+    def test_export_command_resume(self):
+        AuditEvent.objects.create(event='failed_login', username='first')
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        options = {'format': 'csv', 'output': path, 'stderr': StringIO()}
+
+        call_command('export_audit_events', **options)
+        last_id = AuditEvent.objects.latest('id').id
+        AuditEvent.objects.create(event='failed_login', username='second')
+        # the resumed export appends its rows without a second header
+        call_command('export_audit_events', after_id=last_id, **options)
+
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(
+            len([l for l in lines if l.startswith('id,event,')]), 1)
+        self.assertTrue(lines[0].startswith('id,event,'))
+        self.assertEqual(lines[-1].split(',')[2], 'second')
+        self.assertEqual(len(lines), AuditEvent.objects.count() + 1)
+
+
+class AuditRegistryTest(ExchangeTest):
+
+    def test_registered_senders(self):
+        self.assertTrue(registry.is_registered(Layer))
+        self.assertTrue(registry.is_registered(Map))
+        self.assertFalse(registry.is_registered(Theme))
+        self.assertEqual(registry.get_resource_type(Layer()), 'layer')
+        self.assertIsNone(registry.get_resource_type(Theme()))
+
+    def test_unregistered_sender_not_audited(self):
+        count = AuditEvent.objects.count()
+        Theme.objects.create(name='Audit Test', description='Audit Test')
+        self.assertEqual(AuditEvent.objects.count(), count)
+
+    def test_register_and_unregister(self):
+        registry.register(Theme)
+        try:
+            self.assertEqual(registry.get_resource_type(Theme()), 'theme')
+        finally:
+            registry.unregister(Theme)
+        self.assertFalse(registry.is_registered(Theme))
+
+
+class AuditLogRotationTest(ExchangeTest):
+
+    def setUp(self):
+        super(AuditLogRotationTest, self).setUp()
+        self.log_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.log_dir, 'audit.json')
+
+    def tearDown(self):
+        rmtree(self.log_dir)
+
+    def test_size_rotation(self):
+        log = RotatingAuditLog(self.path, max_bytes=200, backup_count=2)
+        for i in range(50):
+            log.write({'event': 'login', 'entry': i})
+
+        rotated = sorted(glob.glob(self.path + '.*'))
+        self.assertEqual(len(rotated), 2)
+        self.assertTrue(all(f.endswith('.gz') for f in rotated))
+        self.assertTrue(os.path.getsize(self.path) <= 200)
+
+        entries = []
+        for f in rotated:
+            entries.extend(gzip.open(f).read().splitlines())
+        entries.extend(open(self.path).read().splitlines())
+        numbers = [json.loads(entry)['entry'] for entry in entries]
+        # the newest entries survive pruning, in order
+        self.assertEqual(numbers, range(50 - len(numbers), 50))
@@ -3,7 +3,7 @@ from django.conf import settings
 from django.contrib import admin
 from django.contrib.admin.sites import AdminSite
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from exchange.core.models import ThumbnailImage
 from exchange.core.context_processors import resource_variables
 from shutil import rmtree
@@ -66,3 +66,245 @@ class resource_variablesTestCase(TestCase):
             self.assertIsNotNone(self.defaults['GEOQUERY_URL'], "GEOQUERY_URL was not defined.")
             # Minimal validation that GEOQUERY_URL is a valid URL
             self.assertNotEqual(urlparse(self.defaults['GEOQUERY_URL']).netloc, '')
+
+
+class PopularCountTestCase(TestCase):
+
+    def test_flush(self):
+        from django.core.cache import cache
+        from geonode.maps.models import Map
+        from exchange.core.counters import flush_popular_counts, record_view
+
+        cache.clear()
+        maps = [
+            Map.objects.create(zoom=0, center_x=0, center_y=0, title=title)
+            for title in ('popular', 'less popular')
+        ]
+        for i in range(3):
+            record_view(maps[0])
+        record_view(maps[1])
+
+        # closes the generation of these views, written by the next flush
+        self.assertEqual(flush_popular_counts(), 0)
+        self.assertEqual(Map.objects.get(pk=maps[0].pk).popular_count, 0)
+        record_view(maps[1])
+
+        self.assertEqual(flush_popular_counts(), 4)
+        self.assertEqual(Map.objects.get(pk=maps[0].pk).popular_count, 3)
+        self.assertEqual(Map.objects.get(pk=maps[1].pk).popular_count, 1)
+
+        self.assertEqual(flush_popular_counts(), 1)
+        self.assertEqual(Map.objects.get(pk=maps[1].pk).popular_count, 2)
+        self.assertEqual(flush_popular_counts(), 0)
+
+
+class FacetsTestCase(TestCase):
+
+    def test_counts_cached_until_change(self):
+        from django.contrib.auth import get_user_model
+        from geonode.maps.models import Map
+        from exchange.core.facets import get_facets
+
+        admin = get_user_model().objects.create_superuser(
+            'facets_admin', 'facets_admin@example.com', 'facets_admin')
+        Map.objects.create(zoom=0, center_x=0, center_y=0, title='facets')
+        self.assertEqual(get_facets(admin, 'facets')['map'], 1)
+
+        # the count is cached, a save invalidates it
+        Map.objects.filter(title='facets').update(title='renamed')
+        self.assertEqual(get_facets(admin, 'facets')['map'], 1)
+        Map.objects.create(zoom=0, center_x=0, center_y=0, title='other')
+        self.assertEqual(get_facets(admin, 'facets')['map'], 0)
+
+    def test_permission_change_invalidates(self):
+        from django.contrib.auth import get_user_model
+        from geonode.maps.models import Map
+        from guardian.shortcuts import assign_perm, remove_perm
+        from exchange.core import facets
+
+        user = get_user_model().objects.create_user(
+            'facets_user', 'facets_user@example.com', 'facets_user')
+        map_obj = Map.objects.create(zoom=0, center_x=0, center_y=0,
+                                     title='facets')
+        facets.get_facets(user, 'facets')
+
+        version = facets._get_version()
+        assign_perm('view_resourcebase', user, map_obj.get_self_resource())
+        self.assertNotEqual(facets._get_version(), version)
+
+        version = facets._get_version()
+        remove_perm('view_resourcebase', user, map_obj.get_self_resource())
+        self.assertNotEqual(facets._get_version(), version)
+
+
+class InstrumentationMiddlewareTestCase(TestCase):
+
+    def test_sampled_request_timings(self):
+        from django.http import HttpResponse
+        from django.template import Context, Template
+        from django.test import RequestFactory
+        from geonode.maps.models import Map
+        from exchange.core.instrumentation import InstrumentationMiddleware
+
+        middleware = InstrumentationMiddleware()
+        middleware.sample_rate = 1
+        request = RequestFactory().get('/maps/')
+        middleware.process_request(request)
+        Map.objects.count()
+        Template('{{ value }}').render(Context({'value': 1}))
+        response = middleware.process_response(request, HttpResponse())
+
+        header = response['Server-Timing']
+        self.assertIn('db;dur=', header)
+        self.assertIn('template;dur=', header)
+        self.assertIn('total;dur=', header)
+
+        # requests left out of the sample are not touched
+        middleware.sample_rate = 0
+        middleware.process_request(request)
+        response = middleware.process_response(request, HttpResponse())
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class TaskMetricsTestCase(TestCase):
+
+    # the counters need a cache that keeps the values, whatever the test
+    # settings use
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_render(self):
+        from django.core.cache import cache
+        from exchange.core.metrics import (render, task_results,
+                                           thumbnail_poll_attempts)
+
+        cache.clear()
+        task_results.inc(task='create_record', state='retry')
+        thumbnail_poll_attempts.observe(4, outcome='image')
+        thumbnail_poll_attempts.observe(1, outcome='image')
+        output = render()
+
+        self.assertIn('# TYPE exchange_task_results_total counter', output)
+        self.assertIn('exchange_task_results_total'
+                      '{state="retry",task="create_record"} 1', output)
+        self.assertIn('exchange_thumbnail_poll_attempts_bucket'
+                      '{le="1",outcome="image"} 1', output)
+        self.assertIn('exchange_thumbnail_poll_attempts_bucket'
+                      '{le="5",outcome="image"} 2', output)
+        self.assertIn('exchange_thumbnail_poll_attempts_sum'
+                      '{outcome="image"} 5.0', output)
+
+    def test_view_requires_token(self):
+        from django.test import RequestFactory, override_settings
+        from exchange.views import metrics
+
+        factory = RequestFactory()
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(metrics(factory.get('/metrics')).status_code,
+                             403)
+            self.assertEqual(metrics(factory.get(
+                '/metrics', HTTP_AUTHORIZATION='Bearer wrong')).status_code,
+                403)
+            response = metrics(factory.get(
+                '/metrics', HTTP_AUTHORIZATION='Bearer secret'))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('exchange_task_runtime_seconds', response.content)
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(metrics(factory.get(
+                '/metrics', HTTP_AUTHORIZATION='Bearer None')).status_code,
+                403)
+
+    def test_view_without_cache(self):
+        from django.test import RequestFactory
+        from exchange.views import metrics
+
+        with override_settings(METRICS_TOKEN='secret', CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+            response = metrics(RequestFactory().get(
+                '/metrics', HTTP_AUTHORIZATION='Bearer secret'))
+        self.assertEqual(response.status_code, 503)
+
+
+class TaskRouterTestCase(TestCase):
+
+    def test_route_for_task(self):
+        from django.test import override_settings
+        from exchange.core.routing import TaskRouter
+
+        routes = {
+            'exchange.thumbnails.tasks': {'queue': 'thumbnails'},
+            'exchange.core.tasks.process_thumbnail_image': {
+                'queue': 'thumbnails', 'priority': 5},
+        }
+        router = TaskRouter()
+        with override_settings(CELERY_TASK_QUEUES=routes):
+            self.assertEqual(
+                router.route_for_task(
+                    'exchange.thumbnails.tasks.generate_thumbnail_task'),
+                {'queue': 'thumbnails'})
+            self.assertEqual(
+                router.route_for_task(
+                    'exchange.core.tasks.process_thumbnail_image'),
+                {'queue': 'thumbnails', 'priority': 5})
+            self.assertIsNone(
+                router.route_for_task('exchange.core.tasks.other_task'))
+
+
+class QueuedSignalProcessorTestCase(TestCase):
+
+    def setUp(self):
+        import mock
+        from exchange.core.signals import QueuedSignalProcessor
+
+        router = mock.Mock()
+        router.for_write.return_value = ['default']
+        self.processor = QueuedSignalProcessor(
+            {'default': mock.MagicMock()}, router)
+        self.addCleanup(self.processor.teardown)
+
+    def test_batched_until_request_finishes(self):
+        import mock
+        from geonode.maps.models import Map
+
+        first, second = mock.Mock(pk=1), mock.Mock(pk=2)
+        with mock.patch('exchange.core.tasks.update_search_index.'
+                        'apply_async') as apply_async:
+            self.processor.start()
+            self.processor.handle_save(Map, first)
+            self.processor.handle_save(Map, second)
+            self.processor.handle_save(Map, first)
+            self.processor.handle_delete(Map, first)
+            self.assertFalse(apply_async.called)
+
+            self.processor.finish()
+            apply_async.assert_called_once_with(
+                args=([
+                    ('default', 'maps', 'map', 1, 'delete'),
+                    ('default', 'maps', 'map', 2, 'update'),
+                ], ),
+                countdown=mock.ANY
+            )
+
+    def test_flushed_outside_request(self):
+        import mock
+        from geonode.maps.models import Map
+
+        with mock.patch('exchange.core.tasks.update_search_index.'
+                        'apply_async') as apply_async:
+            self.processor.handle_save(Map, mock.Mock(pk=1))
+            self.assertEqual(apply_async.call_count, 1)
+
+    def test_flushed_at_batch_size(self):
+        import mock
+        from geonode.maps.models import Map
+
+        with mock.patch('exchange.core.tasks.update_search_index.'
+                        'apply_async') as apply_async, \
+                mock.patch('exchange.core.signals.HAYSTACK_QUEUE_BATCH_SIZE',
+                           2):
+            self.processor.start()
+            self.processor.handle_save(Map, mock.Mock(pk=1))
+            self.assertFalse(apply_async.called)
+            self.processor.handle_save(Map, mock.Mock(pk=2))
+            self.assertEqual(apply_async.call_count, 1)
+            self.processor.finish()
+            self.assertEqual(apply_async.call_count, 1)
@@ -132,3 +132,168 @@ class UploadLayerTest(UploaderMixin, ExchangeTest):
 
         resp = self.client.delete('/importer-api/data/%s' % upload_layers[0].id)
         self.assertEqual(resp.status_code, 301)
+
+    def test_exchange_handlers_save_once(self):
+        import mock
+        from django.db import connection
+        from django.db.models.signals import post_save, pre_save
+        from django.test.utils import CaptureQueriesContext
+        from geonode.layers.models import Layer
+        from exchange.importer.geonode_postimport_handler import \
+            GeoNodePostImportHandler
+        from exchange.importer.geonode_timeextent_handler import \
+            GeoNodeTimeExtentHandler
+
+        config = {
+            'index': 0,
+            'convert_to_date': ['date', 'enddate'],
+            'start_date': 'date',
+            'end_date': 'enddate',
+            'configureTime': True
+        }
+        upload_layers = self.upload_files(
+            ['./boxes_with_end_date.zip'],
+            [{'upload_file_name': 'boxes_with_end_date.zip',
+              'config': dict(config)}]
+        )
+        layername = upload_layers[0].layer_name
+        Layer.objects.filter(name=layername).update(
+            temporal_extent_start=None, temporal_extent_end=None)
+
+        # saves of the layer by the handlers themselves, not the ones made
+        # by the post_save receivers of those saves
+        saves = []
+        depth = [0]
+
+        def before_save(sender, instance, **kwargs):
+            if not depth[0]:
+                saves.append(instance.name)
+            depth[0] += 1
+
+        def after_save(sender, instance, **kwargs):
+            depth[0] -= 1
+        pre_save.connect(before_save, sender=Layer, weak=False)
+        post_save.connect(after_save, sender=Layer, weak=False)
+        self.addCleanup(pre_save.disconnect, before_save, sender=Layer)
+        self.addCleanup(post_save.disconnect, after_save, sender=Layer)
+
+        config['raster'] = False
+        timeextent = GeoNodeTimeExtentHandler(mock.Mock())
+        postimport = GeoNodePostImportHandler(mock.Mock())
+        with CaptureQueriesContext(connection) as queries:
+            timeextent.handle(layername, config)
+        # the extent is only recorded for the post-import handler
+        self.assertFalse([q for q in queries.captured_queries
+                          if '"layers_layer"' in q['sql']])
+        self.assertEqual(saves, [])
+
+        with CaptureQueriesContext(connection) as queries:
+            postimport.handle(layername, config)
+        self.assertEqual(saves, [layername])
+        self.assertEqual(
+            len([q for q in queries.captured_queries
+                 if q['sql'].startswith('SELECT') and
+                 'FROM "layers_layer"' in q['sql'] and
+                 '"layers_layer"."name" =' in q['sql']]), 1)
+        layer = Layer.objects.get(name=layername)
+        self.assertIsNotNone(layer.temporal_extent_start)
+        self.assertIsNotNone(layer.temporal_extent_end)
+
+    def test_import_status(self):
+        import mock
+        from osgeo_importer.models import UploadLayer
+        from exchange.importer.tasks import import_upload_layer
+
+        upload_layer = self.upload_files(
+            ['./boxes_with_end_date.zip'],
+            [{'upload_file_name': 'boxes_with_end_date.zip',
+              'config': {'index': 0}}]
+        )[0]
+        url = '/importer-api/uploads/%s/import' % upload_layer.upload_id
+
+        with mock.patch('osgeo_importer.tasks.import_object',
+                        side_effect=ValueError(u'caf\xe9')):
+            import_upload_layer.apply(args=(upload_layer.id, {'index': 0}))
+        self.assertEqual(
+            UploadLayer.objects.get(id=upload_layer.id).import_status,
+            'FAILURE')
+        layers = json.loads(self.client.get(url).content)['layers']
+        self.assertEqual(layers[0]['import_status'], 'FAILURE')
+        self.assertEqual(layers[0]['error'], u'caf\xe9')
+
+        with mock.patch('osgeo_importer.tasks.import_object'):
+            import_upload_layer.apply(args=(upload_layer.id, {'index': 0}))
+        layers = json.loads(self.client.get(url).content)['layers']
+        self.assertEqual(layers[0]['import_status'], 'SUCCESS')
+
+
+class TimeExtentHandlerTest(ExchangeTest):
+
+    def setUp(self):
+        from django import db
+
+        super(TimeExtentHandlerTest, self).setUp()
+        self.cursor = db.connections[settings.OSGEO_DATASTORE].cursor()
+        self.cursor.execute('CREATE TABLE time_extent_test'
+                            ' (starts timestamp, ends timestamp)')
+        self.addCleanup(self.cursor.execute, 'DROP TABLE time_extent_test')
+        self.cursor.execute(
+            "INSERT INTO time_extent_test VALUES"
+            " ('2001-01-01', '2001-06-01'), ('2000-01-01', '2002-01-01'),"
+            " ('2000-06-01', NULL)"
+        )
+
+    def handle(self):
+        import mock
+        from exchange.importer.geonode_timeextent_handler import \
+            GeoNodeTimeExtentHandler
+
+        config = {
+            'raster': False,
+            'start_date': 'starts',
+            'end_date': 'ends',
+        }
+        GeoNodeTimeExtentHandler(mock.Mock()).handle('time_extent_test',
+                                                     config)
+        self.assertEqual(config['temporal_extent_start'],
+                         '2000-01-01T00:00:00')
+        self.assertEqual(config['temporal_extent_end'],
+                         '2002-01-01T00:00:00')
+
+    def index_count(self):
+        self.cursor.execute("SELECT count(*) FROM pg_indexes"
+                            " WHERE tablename = 'time_extent_test'")
+        return self.cursor.fetchone()[0]
+
+    def test_extent_read_from_indexes(self):
+        self.handle()
+        self.assertEqual(self.index_count(), 2)
+        # an index starting with the column is not created again
+        self.handle()
+        self.assertEqual(self.index_count(), 2)
+
+        # the extent can be read from the indexes, a table this small would
+        # otherwise be scanned
+        self.cursor.execute('SET enable_seqscan = off')
+        self.addCleanup(self.cursor.execute, 'RESET enable_seqscan')
+        self.cursor.execute('EXPLAIN SELECT min(starts), max(ends)'
+                            ' FROM time_extent_test')
+        plan = '\n'.join(row[0] for row in self.cursor.fetchall())
+        self.assertNotIn('Seq Scan', plan)
+
+    def test_extent_without_index(self):
+        import mock
+        from exchange.importer import geonode_timeextent_handler
+
+        with mock.patch.object(geonode_timeextent_handler,
+                               'IMPORT_TIME_INDEX', False):
+            self.handle()
+        self.assertEqual(self.index_count(), 0)
+
+
+class ImportStatusTest(ExchangeTest):
+
+    def test_unknown_upload(self):
+        self.login()
+        resp = self.client.get('/importer-api/uploads/0/import')
+        self.assertEqual(resp.status_code, 404)
@@ -0,0 +1,378 @@
+# Perform tests for storyscapes.
+import codecs
+import csv
+import json
+from StringIO import StringIO
+from decimal import Decimal
+from unittest import TestCase, skipUnless
+
+import mock
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory
+
+from . import ExchangeTest
+from exchange.storyscapes.annotations.views import annotations
+from exchange.storyscapes.bulk import get_progress
+from exchange.storyscapes.models.base import (Story, StoryChapter,
+                                              get_config_version)
+from exchange.storyscapes.models.marker import Marker
+from exchange.storyscapes.utils import (parse_bbox, parse_time_range,
+                                        unicode_csv_dict_reader)
+from exchange.storyscapes.views import new_chapter_json
+from geonode.maps.models import Map
+
+
+class NewChapterTest(ExchangeTest):
+
+    def setUp(self):
+        super(NewChapterTest, self).setUp()
+        self.create_test_user()
+        self.story = Story.objects.create(owner=self.test_user,
+                                          title='story')
+        self.source = Map.objects.create(owner=self.test_user, zoom=0,
+                                         center_x=0, center_y=0,
+                                         title='source')
+
+    def post(self, copy_from):
+        request = RequestFactory().post(
+            '/story/chapter/new',
+            json.dumps({'story_id': self.story.id, 'chapter_index': 1,
+                        'copy_from': copy_from}),
+            content_type='application/json'
+        )
+        request.user = self.test_user
+        return new_chapter_json(request)
+
+    def assertNothingSaved(self, response):
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Map.objects.count(), 1)
+        self.assertFalse(StoryChapter.objects.exists())
+
+    def test_copy_from_missing_map(self):
+        self.assertNothingSaved(self.post(self.source.id + 1000))
+        self.assertNothingSaved(self.post('bogus'))
+
+    def test_copy_from_forbidden_map(self):
+        with mock.patch.object(type(self.test_user), 'has_perm',
+                               return_value=False):
+            self.assertNothingSaved(self.post(self.source.id))
+
+
+class QueryParameterTest(TestCase):
+
+    def test_parse_bbox(self):
+        self.assertEqual(parse_bbox('-10,-5.5,10,5.5'),
+                         [-10.0, -5.5, 10.0, 5.5])
+        for val in ('1,2,3', '1,2,3,4,5', 'a,2,3,4', '10,0,0,10',
+                    '0,10,10,0'):
+            self.assertRaises(ValueError, parse_bbox, val)
+
+    def test_parse_time_range(self):
+        self.assertEqual(parse_time_range('100/200'), (100, 200))
+        self.assertEqual(parse_time_range('100'), (100, 100))
+        self.assertEqual(parse_time_range('2000-01-01/2000-01-02'),
+                         (946684800, 946771200))
+        # slashes of a date aren't taken for the range separator
+        self.assertEqual(parse_time_range('2000/01/02'),
+                         (946771200, 946771200))
+        self.assertEqual(parse_time_range('2000/01/01/2000/01/02'),
+                         (946684800, 946771200))
+        for val in ('01/02/2000', '200/100', '/100', '100/', '', 'a/b'):
+            self.assertRaises(ValueError, parse_time_range, val)
+
+
+class CSVReaderTest(TestCase):
+
+    def test_utf8(self):
+        rows = unicode_csv_dict_reader(
+            codecs.BOM_UTF8 + 'title,content\r\ncaf\xc3\xa9,\r\n')
+        # the BOM isn't part of the first column name, empty values are
+        # left out
+        self.assertEqual(list(rows), [{'title': u'caf\xe9'}])
+        self.assertEqual(list(unicode_csv_dict_reader(u'title\ncaf\xe9\n')),
+                         [{'title': u'caf\xe9'}])
+
+    def test_cp1252_fallback(self):
+        rows = unicode_csv_dict_reader(
+            StringIO('title\ncaf\xc3\xa9\ncaf\xe9 \x80\ncaf\xc3\xa9\n'))
+        self.assertEqual([r['title'] for r in rows],
+                         [u'caf\xe9', u'caf\xe9 \u20ac', u'caf\xc3\xa9'])
+
+    def test_rows_across_chunks(self):
+        # a few chunks worth of rows, some split between two chunks
+        row = 'caf\xc3\xa9,%s\r\n' % ('x' * 100)
+        rows = list(unicode_csv_dict_reader(
+            StringIO('title,content\r\n' + row * 2000)))
+        self.assertEqual(len(rows), 2000)
+        self.assertTrue(all(r == {'title': u'caf\xe9', 'content': u'x' * 100}
+                            for r in rows))
+
+
+class StoryConfigVersionTest(ExchangeTest):
+
+    def setUp(self):
+        super(StoryConfigVersionTest, self).setUp()
+        self.create_test_user()
+        self.story = Story.objects.create(owner=self.test_user,
+                                          title='story')
+        self.chapter_map = Map.objects.create(owner=self.test_user, zoom=0,
+                                              center_x=0, center_y=0,
+                                              title='chapter')
+        StoryChapter.objects.create(story=self.story, map=self.chapter_map,
+                                    chapter_index=0)
+
+    def assertBumps(self, func, *args, **kwargs):
+        version = get_config_version(self.story.id)
+        func(*args, **kwargs)
+        self.assertNotEqual(get_config_version(self.story.id), version)
+
+    def test_map_layer_change(self):
+        from geonode.maps.models import MapLayer
+        self.assertBumps(MapLayer.objects.create, map=self.chapter_map,
+                         stack_order=0, name='layer', visibility=True,
+                         fixed=False)
+
+    def test_permission_change(self):
+        from guardian.shortcuts import assign_perm, remove_perm
+        self.assertBumps(assign_perm, 'view_resourcebase', self.test_user,
+                         self.story.get_self_resource())
+        chapter_resource = self.chapter_map.get_self_resource()
+        self.assertBumps(assign_perm, 'view_resourcebase', self.test_user,
+                         chapter_resource)
+        self.assertBumps(remove_perm, 'view_resourcebase', self.test_user,
+                         chapter_resource)
+
+    def test_permission_change_queries(self):
+        from geonode.base.models import ResourceBase
+        from guardian.models import UserObjectPermission
+        from exchange.storyscapes.models.base import \
+            story_config_permission_changed
+        resource_type = ContentType.objects.get_for_model(ResourceBase)
+        perm = UserObjectPermission(content_type=resource_type,
+                                    object_pk=str(self.chapter_map.id))
+        # loads the content types into the ContentType cache
+        story_config_permission_changed(UserObjectPermission, perm)
+
+        # the stories of a chapter map are found in a single query
+        with self.assertNumQueries(1):
+            self.assertBumps(story_config_permission_changed,
+                             UserObjectPermission, perm)
+        # permissions on other models are skipped without a query
+        perm.content_type = ContentType.objects.get_for_model(Marker)
+        with self.assertNumQueries(0):
+            story_config_permission_changed(UserObjectPermission, perm)
+
+
+class AnnotationsImportTest(ExchangeTest):
+
+    def setUp(self):
+        super(AnnotationsImportTest, self).setUp()
+        self.create_admin_user()
+        self.map = Map.objects.create(owner=self.admin_user, zoom=0,
+                                      center_x=0, center_y=0, title='map')
+        self.path = '/maps/%s/annotations' % self.map.id
+
+    def send(self, request):
+        request.user = self.admin_user
+        return annotations(request, str(self.map.id))
+
+    def post_json(self, features):
+        return self.send(RequestFactory().post(
+            self.path, json.dumps({'features': features}),
+            content_type='application/json'
+        ))
+
+    def post_csv(self, content):
+        upload = SimpleUploadedFile('annotations.csv', content,
+                                    content_type='text/csv')
+        return self.send(RequestFactory().post(self.path, {'csv': upload}))
+
+    def test_upsert(self):
+        response = self.post_json([
+            {'properties': {'title': 'one', 'start_time': 100},
+             'geometry': {'type': 'Point', 'coordinates': [1, 2]}},
+            {'properties': {'title': 'two'}},
+        ])
+        self.assertEqual(response.status_code, 200)
+        ids = json.loads(response.content)['ids']
+        self.assertEqual(len(ids), 2)
+        one = Marker.objects.get(id=ids[0])
+        self.assertEqual(one.start_time, 100)
+        self.assertEqual((one.bbox_x0, one.bbox_y0), (1, 2))
+
+        # rows with an id update the marker in place, the others are added
+        response = self.post_json([
+            {'id': ids[0], 'properties': {'title': 'renamed'},
+             'geometry': {'type': 'Point', 'coordinates': [3, 4]}},
+            {'properties': {'title': 'three'}},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)['ids']), 1)
+        self.assertEqual(
+            sorted(Marker.objects.values_list('title', flat=True)),
+            ['renamed', 'three', 'two'])
+        one = Marker.objects.get(id=ids[0])
+        self.assertEqual(one.title, 'renamed')
+        self.assertEqual((one.bbox_x0, one.bbox_y0), (3, 4))
+
+    def test_upsert_error_rows(self):
+        marker = Marker.objects.create(map=self.map, title='kept')
+        other = Map.objects.create(owner=self.admin_user, zoom=0,
+                                   center_x=0, center_y=0, title='other')
+        foreign = Marker.objects.create(map=other, title='foreign')
+
+        response = self.post_json([
+            {'id': marker.id, 'properties': {'title': 'renamed'}},
+            {'properties': {'title': 'new', 'start_time': 'not a date'}},
+            {'id': foreign.id, 'properties': {'title': 'stolen'}},
+        ])
+        errors = json.loads(response.content)['errors']
+        self.assertEqual([row for row, error in errors], [1, 2])
+        self.assertIn('start_time', errors[0][1])
+        self.assertIn('id', errors[1][1])
+
+        # nothing is written when any row is invalid
+        self.assertEqual(Marker.objects.get(id=marker.id).title, 'kept')
+        self.assertEqual(Marker.objects.get(id=foreign.id).title, 'foreign')
+        self.assertEqual(Marker.objects.filter(map=self.map).count(), 1)
+        self.assertEqual(get_progress(Marker, self.map.id)['phase'],
+                         'failed')
+
+    def test_csv_overwrite(self):
+        Marker.objects.create(map=self.map, title='replaced')
+        with mock.patch('exchange.storyscapes.bulk.BATCH_SIZE', 2):
+            response = self.post_csv(
+                'title,start_time,lat,lon\r\n'
+                'one,2000-01-01,2,1\r\n'
+                'two,,,\r\n'
+                'three,2000-01-02,,\r\n'
+            )
+        self.assertEqual(response.status_code, 200)
+        markers = Marker.objects.filter(map=self.map).order_by('title')
+        self.assertEqual([m.title for m in markers],
+                         ['one', 'three', 'two'])
+        self.assertEqual(markers[0].start_time, 946684800)
+        self.assertEqual((markers[0].bbox_x0, markers[0].bbox_y0), (1, 2))
+        self.assertEqual(get_progress(Marker, self.map.id),
+                         {'phase': 'done', 'rows': 3})
+
+        progress = self.send(RequestFactory().get(self.path,
+                                                  {'progress': ''}))
+        self.assertEqual(json.loads(progress.content),
+                         {'phase': 'done', 'rows': 3})
+
+    def test_csv_error_rows(self):
+        Marker.objects.create(map=self.map, title='kept')
+        response = self.post_csv(
+            'title,start_time\r\n'
+            'one,2000-01-01\r\n'
+            'two,soon\r\n'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('[2] start_time', response.content)
+        self.assertEqual(
+            list(Marker.objects.values_list('title', flat=True)), ['kept'])
+
+
+class AnnotationsExportTest(ExchangeTest):
+
+    def setUp(self):
+        super(AnnotationsExportTest, self).setUp()
+        self.create_admin_user()
+        self.map = Map.objects.create(owner=self.admin_user, zoom=0,
+                                      center_x=0, center_y=0, title='map')
+        self.late = Marker.objects.create(map=self.map, title='late',
+                                          start_time=946771200)
+        self.early = Marker.objects.create(
+            map=self.map, title=u'caf\xe9', content='notes',
+            start_time=946684800, end_time=946771200,
+            the_geom='{"type": "Point", "coordinates": [1, 2]}')
+
+    def get(self, **params):
+        request = RequestFactory().get('/maps/%s/annotations' % self.map.id,
+                                       params)
+        request.user = self.admin_user
+        # one row per chunk, so the chunk separators are covered
+        with mock.patch('exchange.storyscapes.export.CHUNK_SIZE', 1):
+            response = annotations(request, str(self.map.id))
+            self.assertTrue(response.streaming)
+            return ''.join(response.streaming_content)
+
+    def test_csv(self):
+        rows = list(csv.reader(self.get(csv='').splitlines()))
+        self.assertEqual(rows[0][:5], ['title', 'content', 'media',
+                                       'start_time', 'end_time'])
+        self.assertEqual([(r[0], r[3], r[4]) for r in rows[1:]], [
+            ('caf\xc3\xa9', '2000-01-01T00:00:00', '2000-01-02T00:00:00'),
+            ('late', '2000-01-02T00:00:00', ''),
+        ])
+        self.assertEqual(rows[1][1], 'notes')
+
+    def assertFeatures(self, features):
+        self.assertEqual([f['id'] for f in features],
+                         [self.early.id, self.late.id])
+        early, late = features
+        self.assertEqual(json.loads(early['geometry']),
+                         {'type': 'Point', 'coordinates': [1, 2]})
+        self.assertEqual(early['properties']['title'], u'caf\xe9')
+        self.assertEqual(early['properties']['end_time'], 946771200)
+        self.assertNotIn('geometry', late)
+        # empty values are left out
+        self.assertNotIn('content', late['properties'])
+        self.assertNotIn('end_time', late['properties'])
+
+    def test_geojson(self):
+        collection = json.loads(self.get())
+        self.assertEqual(collection['type'], 'FeatureCollection')
+        self.assertFeatures(collection['features'])
+
+        Marker.objects.all().delete()
+        self.assertEqual(json.loads(self.get())['features'], [])
+
+    def test_ndjson(self):
+        lines = self.get(ndjson='').splitlines()
+        self.assertFeatures([json.loads(line) for line in lines])
+
+        Marker.objects.all().delete()
+        self.assertEqual(self.get(ndjson=''), '')
+
+
+@skipUnless('haystack' in settings.INSTALLED_APPS, 'haystack is not enabled')
+class StoryIndexTest(ExchangeTest):
+
+    def setUp(self):
+        from agon_ratings.models import OverallRating
+        from dialogos.models import Comment
+        super(StoryIndexTest, self).setUp()
+        self.create_admin_user()
+        self.story = Story.objects.create(owner=self.admin_user,
+                                          title='story')
+        chapter_map = Map.objects.create(owner=self.admin_user, zoom=0,
+                                         center_x=0, center_y=0,
+                                         title='chapter')
+        StoryChapter.objects.create(story=self.story, map=chapter_map,
+                                    chapter_index=0)
+        StoryChapter.objects.create(story=self.story, chapter_index=1)
+        ct = ContentType.objects.get_for_model(Story)
+        for category, rating in (('a', 3), ('b', 5)):
+            OverallRating.objects.create(object_id=self.story.id,
+                                         content_type=ct, category=category,
+                                         rating=Decimal(rating))
+        Comment.objects.create(author=self.admin_user, content_type=ct,
+                               object_id=self.story.id, comment='comment')
+
+    def test_batched_prepare(self):
+        from exchange.storyscapes.search_indexes import StoryIndex
+        index = StoryIndex()
+        batched = index.index_queryset().get(pk=self.story.pk)
+        story = Story.objects.get(pk=self.story.pk)
+        expected = {'rating': 4.0, 'num_ratings': 2, 'num_comments': 1,
+                    'num_chapters': 1}
+        for field, value in expected.items():
+            prepare = getattr(index, 'prepare_' + field)
+            # index_queryset computed the value, no query is left to make
+            with self.assertNumQueries(0):
+                self.assertEqual(prepare(batched), value)
+            self.assertEqual(prepare(story), value)
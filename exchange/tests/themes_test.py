@@ -137,6 +137,43 @@ class ThemeTestCase(ExchangeTest):
             '/media/theme/img/test2c_delete_me.png'
         )
 
+        # the upload is replaced by a hashed, optimized image
+        from exchange.themes.tasks import process_theme_image
+
+        # nothing is left behind by attempts that can't update the theme
+        process_theme_image.apply(
+            args=(self.t2.pk + 1000, 'banner_logo', self.t2.banner_logo.name))
+        dirs, files = self.t2.banner_logo.storage.listdir('theme/img')
+        self.assertEqual(
+            [f for f in files if f.startswith('test2c_delete_me')],
+            ['test2c_delete_me.png'])
+
+        process_theme_image.apply(
+            args=(self.t2.pk, 'banner_logo', self.t2.banner_logo.name))
+        banner = Theme.objects.get(pk=self.t2.pk).banner_logo
+        self.assertNotEqual(banner.name, 'theme/img/test2c_delete_me.png')
+        self.assertTrue(banner.name.startswith('theme/img/test2c_delete_me.'))
+        self.assertTrue(banner.storage.exists(banner.name))
+        self.assertFalse(
+            banner.storage.exists('theme/img/test2c_delete_me.png'))
+
+        # the same upload for another theme shares the optimized image,
+        # which is kept when that theme's upload is replaced before
+        # being processed
+        t3 = Theme.objects.create(
+            name='test3',
+            banner_logo=SimpleUploadedFile(
+                name='test2c_delete_me.png',
+                content=open(test_img, 'rb').read(),
+                content_type='image/png',
+            )
+        )
+        upload = t3.banner_logo.name
+        Theme.objects.filter(pk=t3.pk).update(banner_logo='theme/img/new.png')
+        process_theme_image.apply(args=(t3.pk, 'banner_logo', upload, None))
+        self.assertTrue(banner.storage.exists(banner.name))
+        self.assertFalse(banner.storage.exists(upload))
+
     def tearDown(self):
             rmtree(theme_dir)
 
@@ -187,3 +224,25 @@ class SetActiveThemeByNameTest(TestCase):
             stdout=out
         )
         self.assertTrue('Successfully' in out.getvalue())
+
+
+class ActiveThemeCacheTest(TestCase):
+    def test_active_theme_invalidation(self):
+        from exchange.themes.models import get_active_theme
+
+        theme = Theme.objects.create(name="Cached", active_theme=True)
+        self.assertEqual(get_active_theme(), theme)
+
+        # held by the process, no queries until the version changes
+        with self.assertNumQueries(0):
+            self.assertEqual(get_active_theme(), theme)
+
+        Theme.objects.filter(id=theme.id).update(active_theme=False)
+        self.assertEqual(get_active_theme(), theme)
+
+        other = Theme.objects.create(name="Other", active_theme=True)
+        self.assertEqual(get_active_theme(), other)
+
+        out = StringIO()
+        call_command('set_active_theme_by_id', theme_id=theme.id, stdout=out)
+        self.assertEqual(get_active_theme(), theme)
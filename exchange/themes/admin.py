@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Theme
+from .models import Theme, invalidate_active_theme
 
 
 class ThemeAdmin(admin.ModelAdmin):
@@ -11,4 +11,17 @@ class ThemeAdmin(admin.ModelAdmin):
             return ['background_logo', 'primary_logo', 'banner_logo']
         return []
 
+    # Theme.save and delete invalidate the active theme inside the admin's
+    # transaction, a request in between could cache the old theme again,
+    # so it is invalidated once more after the commit
+    def changeform_view(self, *args, **kwargs):
+        response = super(ThemeAdmin, self).changeform_view(*args, **kwargs)
+        invalidate_active_theme()
+        return response
+
+    def delete_view(self, *args, **kwargs):
+        response = super(ThemeAdmin, self).delete_view(*args, **kwargs)
+        invalidate_active_theme()
+        return response
+
 admin.site.register(Theme, ThemeAdmin)
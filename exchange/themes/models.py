@@ -1,34 +1,59 @@
 from django.db import models
 from .fields import ColorField
-from PIL import Image
-from io import BytesIO
-from django.core.files.base import ContentFile
-from resizeimage import resizeimage
 from django.conf import settings
+from django.core.cache import cache
+from exchange.themes.tasks import process_theme_image
+
+import time
 
 
 static_url = getattr(settings, 'STATIC_URL', '/static/theme/img/')
 media_url = getattr(settings, 'MEDIA_URL', '/media/theme/img/')
 
 
-def convert_image(image, width, height):
+# kept in the default cache, which must be shared by every process for the
+# others to see a bump, see CACHES in the settings
+_ACTIVE_THEME_VERSION_KEY = 'exchange_active_theme_version'
+
+# (version, theme) of the active theme last read by this process
+_active_theme = (None, None)
+
+
+def _new_version():
+    # not a small counter, a version evicted from the cache and set again
+    # must not match what a process read before
+    return int(time.time() * 1000)
+
+
+def invalidate_active_theme():
     """
-    resize the image to the correct size needed by the template.
+    bump the active theme version, every process reads the theme again.
     """
-    name = image.name
-    pio = Image.open(image)
-    if width is None:
-        img = resizeimage.resize_height(pio, height, validate=False)
-    else:
-        img = resizeimage.resize_cover(pio, [width, height], validate=False)
-    new_image_io = BytesIO()
-    img.save(new_image_io, format=pio.format)
-    image.delete(save=False)
-    image.save(
-        name,
-        content=ContentFile(new_image_io.getvalue()),
-        save=False
-    )
+    try:
+        cache.incr(_ACTIVE_THEME_VERSION_KEY)
+    except ValueError:
+        cache.set(_ACTIVE_THEME_VERSION_KEY, _new_version(), None)
+
+
+def get_active_theme():
+    """
+    returns the active theme, held by the process until its version changes.
+    """
+    global _active_theme
+    version = cache.get(_ACTIVE_THEME_VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        if not cache.add(_ACTIVE_THEME_VERSION_KEY, version, None):
+            version = cache.get(_ACTIVE_THEME_VERSION_KEY)
+
+    cached_version, theme = _active_theme
+    if version is None or version != cached_version:
+        try:
+            theme = Theme.objects.get(active_theme=True)
+        except Theme.DoesNotExist:
+            theme = None
+        _active_theme = (version, theme)
+    return theme
 
 
 class Theme(models.Model):
@@ -177,23 +202,31 @@ class Theme(models.Model):
 
     def save(self, *args, **kwargs):
         """
-        Identifies if the image file is new and what file size it needs to be.
+        Identifies if the image files are new and queues their processing.
         Ensures that only one object has active_theme set to True.
         """
-        if self.__orig_background_logo != self.background_logo:
-            convert_image(self.background_logo, 1440, 350)
-        if self.__orig_primary_logo != self.primary_logo:
-            convert_image(self.primary_logo, None, 120)
-        if self.__orig_banner_logo != self.banner_logo:
-            convert_image(self.banner_logo, None, 35)
+        changed = [] if self.default_theme else [
+            (field, orig.name if orig else None) for field, orig in (
+                ('background_logo', self.__orig_background_logo),
+                ('primary_logo', self.__orig_primary_logo),
+                ('banner_logo', self.__orig_banner_logo),
+            ) if orig != getattr(self, field) and getattr(self, field)
+        ]
 
         if self.active_theme:
-            try:
-                temp = Theme.objects.get(active_theme=True)
-                if self != temp:
-                    temp.active_theme = False
-                    temp.save()
-            except Theme.DoesNotExist:
-                pass
+            Theme.objects.filter(active_theme=True).exclude(
+                pk=self.pk).update(active_theme=False)
 
         super(Theme, self).save(*args, **kwargs)
+        invalidate_active_theme()
+
+        for field, previous in changed:
+            process_theme_image.delay(self.pk, field,
+                                      getattr(self, field).name, previous)
+        self.__orig_background_logo = self.background_logo
+        self.__orig_primary_logo = self.primary_logo
+        self.__orig_banner_logo = self.banner_logo
+
+    def delete(self, *args, **kwargs):
+        super(Theme, self).delete(*args, **kwargs)
+        invalidate_active_theme()
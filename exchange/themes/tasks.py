@@ -0,0 +1,53 @@
+from celery.task import task
+from celery.utils.log import get_task_logger
+
+from exchange.core.images import delete_unused, optimize_image, should_retry
+
+logger = get_task_logger(__name__)
+
+# width, height the theme images are resized to, None keeps the aspect ratio
+THEME_IMAGE_SIZES = {
+    'background_logo': (1440, 350),
+    'primary_logo': (None, 120),
+    'banner_logo': (None, 35),
+}
+
+
+@task(
+    max_retries=5,
+    default_retry_delay=5,
+)
+def process_theme_image(theme_id, field, name, previous=None):
+    """
+    Replace an uploaded theme image by its optimized version. The theme is
+    only updated while it still refers to the uploaded image, it is retried
+    when the save that scheduled it is not visible yet. The images no theme
+    refers to anymore are deleted.
+    """
+    from exchange.themes.models import Theme, invalidate_active_theme
+
+    storage = Theme._meta.get_field(field).storage
+    width, height = THEME_IMAGE_SIZES[field]
+    try:
+        optimized = optimize_image(storage, name, width, height)
+    except IOError:
+        logger.warn('Theme %s: unable to process %s image %s',
+                    theme_id, field, name)
+        return
+
+    updated = Theme.objects.filter(
+        id=theme_id, **{field: name}
+    ).update(**{field: optimized})
+    if updated:
+        invalidate_active_theme()
+    else:
+        current = list(Theme.objects.filter(
+            id=theme_id
+        ).values_list(field, flat=True))
+        if should_retry(process_theme_image, current, previous):
+            raise process_theme_image.retry()
+        logger.debug('Theme %s: %s image %s was replaced or removed',
+                     theme_id, field, name)
+        delete_unused(storage, optimized, Theme.objects.all(),
+                      THEME_IMAGE_SIZES)
+    delete_unused(storage, name, Theme.objects.all(), THEME_IMAGE_SIZES)
@@ -1,13 +1,9 @@
 from django import template
-from exchange.themes.models import Theme
+from exchange.themes.models import get_active_theme
 
 register = template.Library()
 
 
 @register.assignment_tag
 def get_theme():
-    try:
-        theme = Theme.objects.get(active_theme=True)
-    except Theme.DoesNotExist:
-        theme = None
-    return theme
+    return get_active_theme()
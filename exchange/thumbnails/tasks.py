@@ -7,6 +7,8 @@ from geonode.layers.models import Layer
 from geonode.maps.models import Map
 from geonode.utils import http_client
 
+from exchange.core.metrics import thumbnail_poll_attempts
+
 from .models import is_automatic
 from .models import save_thumbnail
 
@@ -57,16 +59,20 @@ def get_gs_thumbnail(instance):
         resp, image = http_client.request(thumbnail_create_url)
         if 200 <= resp.status <= 299:
             if 'ServiceException' not in image:
+                thumbnail_poll_attempts.observe(tries + 1, outcome='image')
                 return image
         else:
             # Unexpected Error Code, Stop Trying
             logger.debug('Thumbnail: Encountered unexpected status code: %d.  Aborting.', resp.status)
             logger.debug(resp)
+            thumbnail_poll_attempts.observe(tries + 1, outcome='error')
             break
 
         # Layer not ready yet, try again
         tries += 1
         time.sleep(1)
+    else:
+        thumbnail_poll_attempts.observe(tries, outcome='timeout')
 
     return None
 
@@ -72,10 +72,19 @@ if 'osgeo_importer' in settings.INSTALLED_APPS:
     # Add django-osgeo-importer URLs
     from osgeo_importer.urls import urlpatterns as osgeo_importer_urls
     urlpatterns += osgeo_importer_urls
+    from exchange.importer.urls import urlpatterns as importer_urls
+    urlpatterns += importer_urls
+
+if settings.METRICS_ENABLED:
+    urlpatterns += [url(r'^metrics$', views.metrics, name='metrics')]
 
 if settings.STORYSCAPES_ENABLED:
     urlpatterns += story_urls
 
+if 'exchange.audit' in settings.INSTALLED_APPS:
+    from exchange.audit.urls import urlpatterns as audit_urls
+    urlpatterns += audit_urls
+
 if 'nearsight' in settings.INSTALLED_APPS:
     from nearsight.urls import urlpatterns as nearsight_urls
     urlpatterns += nearsight_urls
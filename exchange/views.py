@@ -603,6 +603,26 @@ def empty_page(request):
     return HttpResponse('')
 
 
+def metrics(request):
+    """
+    Task metrics in the Prometheus text format, for scrapers sending the
+    METRICS_TOKEN as a bearer token
+    """
+    from django.utils.crypto import constant_time_compare
+    from exchange.core.metrics import recording, render
+
+    token = settings.METRICS_TOKEN
+    auth = request.META.get('HTTP_AUTHORIZATION', '')
+    if not token or not constant_time_compare(auth, 'Bearer %s' % token):
+        return HttpResponse(status=403)
+    if not recording():
+        # zeros would look like an idle queue to the scraper
+        return HttpResponse('The default cache does not keep the metrics\n',
+                            status=503, content_type='text/plain')
+    return HttpResponse(render(),
+                        content_type='text/plain; version=0.0.4')
+
+
 def publish_service(request, pk):
     """
     Publish the service records to the csw catalog
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2017 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+"""
+Shared helpers of the benchmarks that run against a configured Exchange:
+django setup, wall time, query and peak memory measurements, and the
+comparison of a run against a saved baseline.
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+import weakref
+from contextlib import contextmanager
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+
+def setup_django():
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'exchange.settings')
+    import django
+    django.setup()
+
+
+def peak_rss_kb():
+    # kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+@contextmanager
+def measure(aliases=('default',)):
+    """
+    Measure the block: wall time in seconds, queries issued on each
+    database alias and the peak RSS of the process.
+    """
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    result = {}
+    contexts = [CaptureQueriesContext(connections[a]) for a in aliases]
+    for c in contexts:
+        c.__enter__()
+    rss = peak_rss_kb()
+    start = time.time()
+    try:
+        yield result
+    finally:
+        result['seconds'] = time.time() - start
+        for c in contexts:
+            c.__exit__(None, None, None)
+        result['queries'] = dict(
+            (alias, len(c.captured_queries))
+            for alias, c in zip(aliases, contexts)
+        )
+        # ru_maxrss is a high-water mark, the growth is what the block
+        # added over the peak reached before it
+        result['peak_rss_kb'] = peak_rss_kb()
+        result['rss_growth_kb'] = result['peak_rss_kb'] - rss
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return None
+    k = (len(values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def compare(results, baseline_path, tolerance, keys):
+    """
+    Compare results to a baseline written by a previous --output, both
+    dicts of {name: {key: number or {alias: number}}}. Returns the
+    regressions: values more than tolerance above their baseline.
+    """
+    with open(baseline_path) as fp:
+        baseline = json.load(fp)
+
+    def flatten(value, prefix):
+        if isinstance(value, dict):
+            for k, v in value.items():
+                for item in flatten(v, '%s.%s' % (prefix, k)):
+                    yield item
+        elif isinstance(value, (int, long, float)):
+            yield prefix, value
+
+    regressions = []
+    for name, result in sorted(results.items()):
+        for key in keys:
+            if key not in result or key not in baseline.get(name, {}):
+                continue
+            current = dict(flatten(result[key], key))
+            for path, old in flatten(baseline[name][key], key):
+                new = current.get(path)
+                if new is not None and new > old * (1 + tolerance):
+                    regressions.append((name, path, old, new))
+    return regressions
+
+
+def write_results(results, path):
+    with open(path, 'w') as fp:
+        json.dump(results, fp, indent=2, sort_keys=True)
+
+
+def disconnect_receivers(signals, module_prefixes):
+    """
+    Disconnect the receivers defined in the given modules from the
+    signals, e.g. to run without GeoServer. Returns their count.
+    """
+    count = 0
+    for signal in signals:
+        with signal.lock:
+            kept = []
+            for lookup_key, ref in signal.receivers:
+                receiver = ref() if isinstance(ref, weakref.ReferenceType) \
+                    else ref
+                module = getattr(receiver, '__module__', None) or ''
+                if module.startswith(tuple(module_prefixes)):
+                    count += 1
+                else:
+                    kept.append((lookup_key, ref))
+            signal.receivers = kept
+            signal.sender_receivers_cache.clear()
+    return count
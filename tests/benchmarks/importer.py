@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2017 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+"""
+Benchmark of the import handler chain on synthetic vector datasets, run
+from the repository root against a configured Exchange and its PostGIS
+datastore:
+
+    python tests/benchmarks/importer.py --features 1000,100000,1000000
+
+For each size a point table is generated in the datastore, with and
+without start/end time columns, a GeoNode layer is registered for it and
+the handlers are run on it. GeoServer is stubbed: its signal receivers are
+disconnected and only handlers that don't talk to it are run by default.
+Wall time, queries issued and peak RSS are reported per handler.
+
+--output writes the results as JSON, --baseline compares them to a
+previous output and exits with 1 when a value grew by more than
+--tolerance, for CI runs.
+
+--geojson DIR also writes the datasets as GeoJSON files, to run them
+through the upload UI and the complete osgeo_importer pipeline.
+"""
+
+import json
+import optparse
+import os
+import sys
+
+from harness import (compare, disconnect_receivers, measure, setup_django,
+                     write_results)
+
+DEFAULT_HANDLERS = [
+    'exchange.importer.geonode_timeextent_handler.GeoNodeTimeExtentHandler',
+    'exchange.importer.geonode_postimport_handler.GeoNodePostImportHandler',
+]
+
+# modules whose signal receivers call out to GeoServer
+STUBBED_MODULES = ['geonode.geoserver', 'exchange.thumbnails']
+
+TABLE_PREFIX = 'bench_import_'
+
+
+class BenchmarkImporter(object):
+    """stands for the osgeo_importer importer the handlers are given"""
+
+
+def table_name(features, with_time):
+    return '%s%d%s' % (TABLE_PREFIX, features, '_time' if with_time else '')
+
+
+def create_table(cursor, name, features, with_time):
+    cursor.execute('DROP TABLE IF EXISTS %s' % name)
+    # the same seed gives the same dataset on every run
+    cursor.execute('SELECT setseed(0.42)')
+    time_columns = ''
+    if with_time:
+        time_columns = (
+            ", timestamp with time zone '2000-01-01 00:00:00+00'"
+            " + (random() * 3650) * interval '1 day' AS start_time"
+            ", timestamp with time zone '2010-01-01 00:00:00+00'"
+            " + (random() * 3650) * interval '1 day' AS end_time"
+        )
+    cursor.execute(
+        'CREATE TABLE %s AS SELECT g AS fid,'
+        ' ST_SetSRID(ST_MakePoint(random() * 360 - 180,'
+        ' random() * 180 - 90), 4326) AS the_geom,'
+        " 'feature ' || g AS name, (random() * 1000)::integer AS value"
+        '%s FROM generate_series(1, %%s) AS g' % (name, time_columns),
+        [features]
+    )
+    cursor.execute('ALTER TABLE %s ADD PRIMARY KEY (fid)' % name)
+    cursor.execute('ANALYZE %s' % name)
+
+
+def write_geojson(directory, name, features, with_time):
+    import random
+
+    rnd = random.Random(42)
+    path = os.path.join(directory, '%s.geojson' % name)
+    with open(path, 'w') as fp:
+        fp.write('{"type": "FeatureCollection", "features": [\n')
+        for i in xrange(1, features + 1):
+            props = {'fid': i, 'name': 'feature %d' % i,
+                     'value': rnd.randint(0, 1000)}
+            if with_time:
+                props['start_time'] = '%04d-%02d-%02dT00:00:00Z' % (
+                    rnd.randint(2000, 2009), rnd.randint(1, 12),
+                    rnd.randint(1, 28))
+                props['end_time'] = '%04d-%02d-%02dT00:00:00Z' % (
+                    rnd.randint(2010, 2019), rnd.randint(1, 12),
+                    rnd.randint(1, 28))
+            fp.write('%s%s' % (',\n' if i > 1 else '', json.dumps({
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [
+                    rnd.uniform(-180, 180), rnd.uniform(-90, 90)]},
+                'properties': props,
+            })))
+        fp.write('\n]}\n')
+    return path
+
+
+def register_layer(name, owner):
+    from geonode.layers.models import Layer
+
+    Layer.objects.filter(name=name).delete()
+    return Layer.objects.create(
+        name=name,
+        title=name,
+        typename='geonode:%s' % name,
+        workspace='geonode',
+        store='exchange_imports',
+        storeType='dataStore',
+        owner=owner,
+    )
+
+
+def run_handlers(handler_classes, name, with_time, aliases):
+    layer_config = {'raster': False, 'index': 0}
+    if with_time:
+        layer_config['start_date'] = 'start_time'
+        layer_config['end_date'] = 'end_time'
+
+    importer = BenchmarkImporter()
+    results = {}
+    with measure(aliases) as total:
+        for handler_class in handler_classes:
+            handler = handler_class(importer)
+            with measure(aliases) as result:
+                handler.handle(name, layer_config)
+            results[handler_class.__name__] = result
+    results['total'] = total
+    return results
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--features', default='1000,10000,100000',
+                      help='comma separated dataset sizes, up to 10000000')
+    parser.add_option('--time', choices=['both', 'with', 'without'],
+                      default='both',
+                      help='datasets with or without time columns')
+    parser.add_option('--handlers', default=','.join(DEFAULT_HANDLERS),
+                      help='comma separated import handlers to run')
+    parser.add_option('--geojson', metavar='DIR',
+                      help='also write the datasets as GeoJSON files')
+    parser.add_option('--keep', action='store_true', default=False,
+                      help='keep the generated tables and layers')
+    parser.add_option('--output', help='write the results as JSON')
+    parser.add_option('--baseline', help='JSON results to compare with')
+    parser.add_option('--tolerance', type='float', default=0.25,
+                      help='allowed growth over the baseline')
+    options, _ = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.db import connections
+    from django.db.models import signals
+    from django.utils.module_loading import import_string
+
+    disconnect_receivers(
+        [signals.pre_save, signals.post_save,
+         signals.pre_delete, signals.post_delete],
+        STUBBED_MODULES
+    )
+
+    datastore = getattr(settings, 'OSGEO_DATASTORE', 'exchange_imports')
+    aliases = sorted(set(['default', datastore]))
+    handler_classes = [import_string(h) for h in options.handlers.split(',')]
+    owner, _ = get_user_model().objects.get_or_create(username='benchmark')
+    time_modes = {'both': [False, True], 'with': [True],
+                  'without': [False]}[options.time]
+
+    results = {}
+    for features in [int(f) for f in options.features.split(',')]:
+        for with_time in time_modes:
+            name = table_name(features, with_time)
+            if options.geojson:
+                write_geojson(options.geojson, name, features, with_time)
+            with connections[datastore].cursor() as cursor:
+                create_table(cursor, name, features, with_time)
+            layer = register_layer(name, owner)
+            try:
+                results[name] = run_handlers(handler_classes, name,
+                                             with_time, aliases)
+            finally:
+                if not options.keep:
+                    type(layer).objects.filter(pk=layer.pk).delete()
+                    with connections[datastore].cursor() as cursor:
+                        cursor.execute('DROP TABLE IF EXISTS %s' % name)
+
+            for handler, result in sorted(results[name].items()):
+                print '%-24s %-28s %8.3fs %s queries %8d KB' % (
+                    name, handler, result['seconds'],
+                    '/'.join(str(result['queries'][a]) for a in aliases),
+                    result['peak_rss_kb'])
+
+    if options.output:
+        write_results(results, options.output)
+
+    if options.baseline:
+        regressions = compare(results, options.baseline, options.tolerance,
+                              ['seconds', 'queries'])
+        for name, key, old, new in regressions:
+            print 'REGRESSION %s %s: %s -> %s' % (name, key, old, new)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
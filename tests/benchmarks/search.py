@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2017 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+"""
+Benchmark of exchange.views.unified_elastic_search, run from the
+repository root against a configured Exchange:
+
+    python tests/benchmarks/search.py --corpus 50000 --requests 2000
+
+A seeded corpus of layers, maps, documents, stories and registry records
+is indexed into --index of the Elasticsearch at ES_URL, best a local one
+used for nothing else as the view searches all its indices. A weighted mix
+of text, facet, bbox, date range and deep page queries is then replayed
+against the view, and p50/p95/p99 latency, Elasticsearch round trips and
+database queries per request are reported, per query kind and overall.
+
+--fake serves Elasticsearch from the corpus in process instead: queries
+are not evaluated, pages and aggregations are cut from the corpus as is,
+which measures the view itself without a cluster.
+
+--output, --baseline and --tolerance work as for the importer benchmark.
+"""
+
+import optparse
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+
+from harness import compare, measure, percentile, setup_django, write_results
+
+RESOURCE_TYPES = ['layer', 'map', 'document', 'story']
+CATEGORIES = ['boundaries', 'elevation', 'environment', 'farming',
+              'health', 'imageryBaseMapsEarthCover', 'transportation']
+WORDS = ['river', 'road', 'water', 'census', 'flood', 'forest', 'coast',
+         'city', 'rail', 'soil', 'crop', 'storm', 'border', 'survey']
+OWNERS = ['admin', 'analyst', 'editor', 'viewer', 'registry']
+HOSTS = ['exchange.example.com', 'registry.example.com', 'maps.example.org']
+
+KEYWORD = {'type': 'string', 'index': 'not_analyzed'}
+TEXT = {'type': 'string'}
+MAPPING_PROPERTIES = dict(
+    [(f, TEXT) for f in ('title', 'text', 'abstract', 'title_alternate')] +
+    [('%s_exact' % f, KEYWORD) for f in (
+        'type', 'subtype', 'owner__username', 'keywords', 'category',
+        'source_host')] +
+    [(f, KEYWORD) for f in ('type', 'subtype', 'django_id')] +
+    [(f, {'type': 'date'}) for f in (
+        'date', 'temporal_extent_start', 'temporal_extent_end')] +
+    [(f, {'type': 'double'}) for f in (
+        'bbox_left', 'bbox_bottom', 'bbox_right', 'bbox_top')] +
+    [('has_time', {'type': 'boolean'}),
+     ('popular_count', {'type': 'integer'})]
+)
+DOC_TYPES = ['modelresult', 'layer']
+
+
+def _date(rnd, start_year, end_year):
+    return '%04d-%02d-%02dT00:00:00' % (rnd.randint(start_year, end_year),
+                                        rnd.randint(1, 12),
+                                        rnd.randint(1, 28))
+
+
+def generate_corpus(count, seed, registry_share=0.2):
+    """
+    (doc type, id, source) of count seeded documents. geonode resources
+    are indexed by haystack as modelresult, registry records as layer.
+    """
+    rnd = random.Random(seed)
+    for i in xrange(1, count + 1):
+        registry = rnd.random() < registry_share
+        rtype = 'layer' if registry else rnd.choice(RESOURCE_TYPES)
+        title = ' '.join(rnd.choice(WORDS) for _ in xrange(3))
+        left, bottom = rnd.uniform(-180, 170), rnd.uniform(-90, 80)
+        right, top = left + rnd.uniform(0, 10), bottom + rnd.uniform(0, 10)
+        has_time = rnd.random() < 0.3
+        source = {
+            'title': title.title(),
+            'abstract': ' '.join(rnd.choice(WORDS) for _ in xrange(20)),
+            'text': title,
+            'type': rtype,
+            'type_exact': rtype,
+            'subtype_exact': rnd.choice(['vector', 'raster', 'remote'])
+            if rtype == 'layer' else rtype,
+            'owner__username_exact': rnd.choice(OWNERS),
+            'keywords_exact': rnd.sample(WORDS, 3),
+            'category_exact': rnd.choice(CATEGORIES),
+            'source_host_exact': rnd.choice(HOSTS),
+            'date': _date(rnd, 2000, 2017),
+            'bbox_left': left, 'bbox_bottom': bottom,
+            'bbox_right': right, 'bbox_top': top,
+            'has_time': has_time,
+            'popular_count': rnd.randint(0, 500),
+        }
+        if has_time:
+            source['temporal_extent_start'] = _date(rnd, 1990, 2005)
+            source['temporal_extent_end'] = _date(rnd, 2006, 2017)
+        if registry:
+            source['bbox'] = [left, bottom, right, top]
+            source['links'] = {'xml': 'layer/%d/xml' % i,
+                               'png': 'layer/%d/png' % i}
+            yield 'layer', 'registry-%d' % i, source
+        else:
+            source['django_id'] = str(i)
+            yield 'modelresult', 'geonode-%d' % i, source
+
+
+def seed_index(es, index, corpus):
+    from elasticsearch.helpers import bulk
+
+    if es.indices.exists(index=index):
+        es.indices.delete(index=index)
+    es.indices.create(index=index, body={'mappings': dict(
+        (t, {'properties': MAPPING_PROPERTIES}) for t in DOC_TYPES
+    )})
+    bulk(es, ({'_index': index, '_type': doc_type, '_id': doc_id,
+               '_source': source}
+              for doc_type, doc_id, source in corpus))
+    es.indices.refresh(index=index)
+
+
+class FakeTransport(object):
+    """answers the requests of the view from the corpus, in process"""
+
+    def __init__(self, index, corpus):
+        self.index = index
+        self.docs = list(corpus)
+
+    def perform_request(self, method, url, params=None, body=None, **kwargs):
+        if url.endswith('/_mapping'):
+            return {self.index: {'mappings': dict(
+                (t, {'properties': MAPPING_PROPERTIES}) for t in DOC_TYPES
+            )}}
+        if url.endswith('/_search'):
+            return self.search(body or {})
+        raise ValueError('Unexpected request %s %s' % (method, url))
+
+    def search(self, body):
+        start = body.get('from', 0)
+        size = body.get('size', 10)
+        hits = [
+            {'_index': self.index, '_type': doc_type, '_id': doc_id,
+             '_score': 1.0, '_source': source}
+            for doc_type, doc_id, source in self.docs[start:start + size]
+        ]
+        aggregations = {}
+        for name, agg in body.get('aggs', {}).items():
+            field = agg['terms']['field']
+            counts = Counter()
+            for _, _, source in self.docs:
+                value = source.get(field)
+                for v in value if isinstance(value, list) else [value]:
+                    if v is not None:
+                        counts[v] += 1
+            aggregations[name] = {
+                'doc_count_error_upper_bound': 0,
+                'sum_other_doc_count': 0,
+                'buckets': [{'key': k, 'doc_count': c} for k, c in
+                            counts.most_common(int(agg['terms']['size']))],
+            }
+        return {
+            'took': 0, 'timed_out': False,
+            '_shards': {'total': 1, 'successful': 1, 'failed': 0},
+            'hits': {'total': len(self.docs), 'max_score': 1.0,
+                     'hits': hits},
+            'aggregations': aggregations,
+        }
+
+
+def query_mix(deep_offset):
+    """(kind, weight, params factory) of the replayed queries"""
+    def bbox(rnd):
+        left, bottom = rnd.uniform(-180, 140), rnd.uniform(-90, 50)
+        return '%f,%f,%f,%f' % (left, bottom, left + 40, bottom + 40)
+
+    return [
+        ('browse', 20, lambda rnd: {}),
+        ('text', 25, lambda rnd: {'q': rnd.choice(WORDS)}),
+        ('text_or', 5, lambda rnd: {
+            'q': '%s OR %s' % (rnd.choice(WORDS), rnd.choice(WORDS))}),
+        ('phrase', 5, lambda rnd: {
+            'q': '"%s %s"' % (rnd.choice(WORDS), rnd.choice(WORDS))}),
+        ('facets', 15, lambda rnd: {
+            'type__in': rnd.choice(RESOURCE_TYPES),
+            'category__in': rnd.choice(CATEGORIES)}),
+        ('bbox', 10, lambda rnd: {'extent': bbox(rnd)}),
+        ('date_range', 5, lambda rnd: {
+            'date__range': '%s,%s' % (_date(rnd, 2000, 2008),
+                                      _date(rnd, 2009, 2017))}),
+        ('time_extent', 5, lambda rnd: {
+            'has_time': 'true',
+            'extent__range': '%s,%s' % (_date(rnd, 1990, 2000),
+                                        _date(rnd, 2001, 2017))}),
+        ('sorted', 5, lambda rnd: {'order_by': rnd.choice(
+            ['title', '-title', '-date', '-popular_count'])}),
+        ('deep_page', 5, lambda rnd: {
+            'offset': rnd.randint(deep_offset // 2, deep_offset),
+            'limit': 20}),
+    ]
+
+
+def replay(view, user, count, seed, deep_offset, aliases):
+    from django.test import RequestFactory
+    import elasticsearch.transport
+
+    factory = RequestFactory()
+    mix = query_mix(deep_offset)
+    rnd = random.Random(seed)
+    weights = [w for _, w, _ in mix]
+
+    es_requests = [0]
+    perform_request = elasticsearch.transport.Transport.perform_request
+
+    def counting(self, *args, **kwargs):
+        es_requests[0] += 1
+        return perform_request(self, *args, **kwargs)
+
+    elasticsearch.transport.Transport.perform_request = counting
+    samples = defaultdict(list)
+    try:
+        for _ in xrange(count):
+            pick = rnd.uniform(0, sum(weights))
+            for kind, weight, params in mix:
+                pick -= weight
+                if pick <= 0:
+                    break
+            request = factory.get('/api/base/search/', params(rnd))
+            request.user = user
+            es_requests[0] = 0
+            with measure(aliases) as result:
+                response = view(request, resourcetype='base')
+            if response.status_code != 200:
+                raise RuntimeError('%s returned %s' % (
+                    request.get_full_path(), response.status_code))
+            samples[kind].append((result['seconds'], es_requests[0],
+                                  sum(result['queries'].values())))
+    finally:
+        elasticsearch.transport.Transport.perform_request = perform_request
+    return samples
+
+
+def summarize(samples):
+    results = {}
+    everything = []
+    for kind, values in samples.items():
+        everything.extend(values)
+        results[kind] = _summary(values)
+    results['all'] = _summary(everything)
+    return results
+
+
+def _summary(values):
+    seconds = [v[0] for v in values]
+    return {
+        'requests': len(values),
+        'p50': percentile(seconds, 50),
+        'p95': percentile(seconds, 95),
+        'p99': percentile(seconds, 99),
+        'es_requests': float(sum(v[1] for v in values)) / len(values),
+        'db_queries': float(sum(v[2] for v in values)) / len(values),
+    }
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--corpus', type='int', default=10000,
+                      help='documents indexed')
+    parser.add_option('--requests', type='int', default=500,
+                      help='search requests replayed')
+    parser.add_option('--seed', type='int', default=42)
+    parser.add_option('--index', default='exchange_search_benchmark',
+                      help='index the corpus is written to')
+    parser.add_option('--skip-seed', action='store_true', default=False,
+                      help='reuse the index of a previous run')
+    parser.add_option('--keep', action='store_true', default=False,
+                      help='keep the index after the run')
+    parser.add_option('--fake', action='store_true', default=False,
+                      help='serve Elasticsearch from the corpus in process')
+    parser.add_option('--user', help='search as this user, else anonymous')
+    parser.add_option('--deep-offset', type='int', default=5000,
+                      help='largest offset of the deep page queries')
+    parser.add_option('--output', help='write the results as JSON')
+    parser.add_option('--baseline', help='JSON results to compare with')
+    parser.add_option('--tolerance', type='float', default=0.25,
+                      help='allowed growth over the baseline')
+    options, _ = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.models import AnonymousUser
+    from elasticsearch import Elasticsearch
+    import elasticsearch.transport
+
+    from exchange.views import unified_elastic_search
+
+    # result links are built from it
+    settings.REGISTRYURL = settings.REGISTRYURL or 'http://localhost:8001/'
+
+    user = AnonymousUser()
+    if options.user:
+        user = get_user_model().objects.get(username=options.user)
+
+    corpus = generate_corpus(options.corpus, options.seed)
+    es = None
+    if options.fake:
+        fake = FakeTransport(options.index, corpus)
+        elasticsearch.transport.Transport.perform_request = \
+            lambda self, *args, **kwargs: fake.perform_request(*args,
+                                                               **kwargs)
+    else:
+        es = Elasticsearch(settings.ES_URL)
+        if not options.skip_seed:
+            start = time.time()
+            seed_index(es, options.index, corpus)
+            print 'indexed %d documents in %.1fs' % (options.corpus,
+                                                     time.time() - start)
+
+    try:
+        samples = replay(unified_elastic_search, user, options.requests,
+                         options.seed, options.deep_offset, ['default'])
+    finally:
+        if es is not None and not options.keep:
+            es.indices.delete(index=options.index)
+
+    results = summarize(samples)
+    print '%-12s %8s %9s %9s %9s %6s %6s' % (
+        'kind', 'requests', 'p50 ms', 'p95 ms', 'p99 ms', 'es', 'db')
+    for kind, r in sorted(results.items()):
+        print '%-12s %8d %9.1f %9.1f %9.1f %6.1f %6.1f' % (
+            kind, r['requests'], r['p50'] * 1000, r['p95'] * 1000,
+            r['p99'] * 1000, r['es_requests'], r['db_queries'])
+
+    if options.output:
+        write_results(results, options.output)
+
+    if options.baseline:
+        regressions = compare(results, options.baseline, options.tolerance,
+                              ['p50', 'p95', 'p99', 'es_requests',
+                               'db_queries'])
+        for name, key, old, new in regressions:
+            print 'REGRESSION %s %s: %s -> %s' % (name, key, old, new)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#########################################################################
+#
+# Copyright (C) 2017 Boundless Spatial
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#########################################################################
+
+"""
+Benchmark of exchange.storyscapes.utils.parse_date_time against the
+strptime loop it replaced, run from the repository root:
+
+    python tests/benchmarks/storyscapes_dates.py [--rows N] [--fuzz N]
+
+Both parsers are first checked to give identical results on the sample
+values plus N randomly generated ones.
+"""
+
+import datetime
+import optparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from exchange.storyscapes.utils import parse_date_time  # noqa
+
+
+def _legacy_patterns():
+    dateparts = '%Y', '%m', '%d'
+    timeparts = '%H', '%M', '%S'
+    patterns = []
+    for i in xrange(len(dateparts)):
+        patterns.append('/'.join(dateparts[0:i + 1]))
+        patterns.append('-'.join(dateparts[0:i + 1]))
+    for i in xrange(len(timeparts)):
+        time = ':'.join(timeparts[0:i + 1])
+        patterns.append('/'.join(dateparts) + 'T' + time)
+        patterns.append('-'.join(dateparts) + 'T' + time)
+        patterns.append('/'.join(dateparts) + ' ' + time)
+        patterns.append('-'.join(dateparts) + ' ' + time)
+    return set(patterns)
+
+
+_patterns = _legacy_patterns()
+
+
+def legacy_parse_date_time(val):
+    if val is None:
+        return None
+    if val[0] == '-':
+        raise ValueError('Alas, negative dates are not supported')
+    idx = val.find('.')
+    if idx > 0:
+        val = val[:idx]
+    for p in _patterns:
+        try:
+            return datetime.datetime.strptime(val, p)
+        except ValueError:
+            pass
+
+
+SAMPLES = [
+    '2016', '2016-05', '2016/5', '2016-05-17', '2016/05/17',
+    '2016-05-17T08', '2016-05-17 08:30', '2016/05/17T08:30:15',
+    '2016-05-17 08:30:15.250', '2016-5-7  8:3:5', '2016-05- 7',
+    '2016-05-17t08:30', '2016-02-30', '0000', '2016-05-17 24:00',
+    '2016-05-17 23:59:60', '2016-13', '16-05-17', '2016-05/17',
+    '2016-05-17\t08', '2016-05-17\n', 'May 17, 2016', '',
+    u'2016-05-17 08:30', u'２０１６',
+]
+
+_pieces = ['2016', '1999', '0000', '-', '/', 'T', 't', ' ', '  ', '\t', ':',
+           '0', '1', '5', '9', '12', '13', '23', '24', '29', '30', '31', '59',
+           '60', '61', '.5', 'x', '\n']
+
+
+def fuzz_values(count, seed=0):
+    rnd = random.Random(seed)
+    for _ in xrange(count):
+        yield ''.join(rnd.choice(_pieces) for _ in xrange(rnd.randint(1, 9)))
+
+
+def _result(parse, val):
+    try:
+        return parse(val)
+    except ValueError, e:
+        return 'ValueError: %s' % e
+    except IndexError:
+        return 'IndexError'
+
+
+def check(values):
+    mismatches = [
+        (val, _result(legacy_parse_date_time, val), _result(parse_date_time, val))
+        for val in values
+        if _result(legacy_parse_date_time, val) != _result(parse_date_time, val)
+    ]
+    for val, old, new in mismatches:
+        print '%r: legacy %r, new %r' % (val, old, new)
+    return not mismatches
+
+
+def bench(parse, values, repeat=3):
+    def run():
+        for val in values:
+            parse(val)
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--rows', type='int', default=20000,
+                      help='values parsed per run')
+    parser.add_option('--fuzz', type='int', default=50000,
+                      help='random values checked for identical results')
+    options, _ = parser.parse_args()
+
+    if not check(SAMPLES + list(fuzz_values(options.fuzz))):
+        sys.exit(1)
+
+    # a typical upload, a few formats and mostly valid dates
+    values = [SAMPLES[i % 10] for i in xrange(options.rows)]
+    legacy = bench(legacy_parse_date_time, values)
+    current = bench(parse_date_time, values)
+    print '%d values' % len(values)
+    print 'strptime loop: %.3fs' % legacy
+    print 'regex dispatch: %.3fs (%.1fx)' % (current, legacy / current)
+
+
+if __name__ == '__main__':
+    main()